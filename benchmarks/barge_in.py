@@ -0,0 +1,177 @@
+"""Replay scripted caller interruptions against TurnController with stub backends.
+
+    python -m benchmarks.barge_in
+
+Each scenario is a timeline of interim and final transcripts. The stub reply
+streams tokens at a fixed rate and queues two seconds of audio per sentence.
+The run prints the turn metrics per scenario, how long after the caller's
+last final (not counting backchannels) the answered reply started, and whether the metrics match what the
+scenario expects, exiting non-zero on any mismatch.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from turns import TurnController
+
+SCENARIOS = [
+    {
+        "name": "uninterrupted reply",
+        "events": [(0.0, "final", "Worli mein 3 BHK ka price kya hai?")],
+        "expect": {"turns": 1, "completed": 1, "interruptions": 0, "restarts": 0},
+    },
+    {
+        "name": "barge-in mid reply",
+        "events": [
+            (0.0, "final", "Tell me about Lodha World One."),
+            (1.0, "interim", "actually what"),
+            (1.5, "final", "Actually, what about Powai?"),
+        ],
+        "expect": {"turns": 2, "completed": 1, "interruptions": 1},
+    },
+    {
+        "name": "one-word barge-in waits for its final",
+        "events": [
+            (0.0, "final", "Tell me about Lodha World One."),
+            (1.0, "interim", "stop"),
+            (1.2, "final", "Stop."),
+        ],
+        "expect": {"turns": 2, "completed": 1, "interruptions": 1, "backchannels": 0},
+    },
+    {
+        "name": "rapid finals debounced into one turn",
+        "events": [
+            (0.0, "final", "I want a flat"),
+            (0.2, "final", "in Worli"),
+            (0.4, "final", "under ten crore."),
+        ],
+        "expect": {"turns": 1, "completed": 1, "debounced_finals": 2, "restarts": 2},
+    },
+    {
+        "name": "caller keeps talking through the debounce",
+        "events": [
+            (0.0, "final", "Mujhe ek ghar chahiye"),
+            (0.4, "interim", "Powai"),
+            (0.9, "final", "Powai mein."),
+        ],
+        "expect": {"turns": 1, "completed": 1, "interruptions": 0, "restarts": 1},
+    },
+    {
+        "name": "interim without a final after a final",
+        "events": [
+            (0.0, "final", "I want a flat in Worli."),
+            (0.3, "interim", "hmm"),
+        ],
+        "expect": {"turns": 1, "completed": 1, "interruptions": 0, "restarts": 1},
+    },
+    {
+        "name": "fillers and acknowledgements over the reply",
+        "events": [
+            (0.0, "final", "Tell me about Lodha World One."),
+            (0.8, "interim", "hmm"),
+            (0.9, "final", "Hmm."),
+            (1.2, "interim", "haan ji"),
+            (1.4, "final", "Haan ji, okay."),
+        ],
+        "expect": {"turns": 1, "completed": 1, "interruptions": 0, "backchannels": 2},
+    },
+    {
+        "name": "two interruptions in a row",
+        "events": [
+            (0.0, "final", "Amenities batao."),
+            (1.2, "final", "Nahi, price batao."),
+            (2.4, "final", "Sorry, possession date?"),
+        ],
+        "expect": {"turns": 3, "completed": 1, "interruptions": 2},
+    },
+]
+
+
+class StubAudio:
+    """Tracks audio queued for playout the way rtc.AudioSource does."""
+
+    def __init__(self):
+        self.queued = 0.0
+
+    def flush(self):
+        dropped, self.queued = self.queued, 0.0
+        return dropped
+
+
+def make_respond(audio, args, replies):
+    async def respond(text, language_hint, turn):
+        started = asyncio.get_running_loop().time()
+        await asyncio.sleep(args.ttft)
+        for token in range(args.tokens):
+            await asyncio.sleep(1 / args.token_rate)
+            turn.count_token()
+            if token % args.tokens_per_sentence == args.tokens_per_sentence - 1:
+                turn.count_audio(args.sentence_seconds)
+                audio.queued += args.sentence_seconds
+        replies.append((text, started))
+
+    return respond
+
+
+async def run_scenario(scenario, args):
+    audio = StubAudio()
+    replies = []
+    controller = TurnController(
+        make_respond(audio, args, replies), flush_audio=audio.flush, debounce=args.debounce
+    )
+    start = asyncio.get_running_loop().time()
+    last_final = start
+    for at, kind, text in scenario["events"]:
+        await asyncio.sleep(max(0.0, start + at - asyncio.get_running_loop().time()))
+        if kind == "interim":
+            controller.on_interim(text)
+        else:
+            backchannels = controller.metrics.backchannels
+            controller.on_final(text)
+            if controller.metrics.backchannels == backchannels:
+                last_final = asyncio.get_running_loop().time()
+
+    await controller.wait_idle()
+    await controller.aclose()
+
+    metrics = controller.metrics.as_dict()
+    failures = {
+        key: (expected, metrics[key])
+        for key, expected in scenario["expect"].items()
+        if metrics[key] != expected
+    }
+    delay = replies[-1][1] - last_final if replies else None
+    return metrics, [text for text, _ in replies], delay, failures
+
+
+async def main_async(args):
+    failed = 0
+    for scenario in SCENARIOS:
+        metrics, replies, delay, failures = await run_scenario(scenario, args)
+        status = "ok  " if not failures else "FAIL"
+        print(f"{status} {scenario['name']}")
+        print(f"     {metrics}")
+        print(f"     answered: {replies}")
+        if delay is not None:
+            print(f"     reply started {1000 * delay:.0f} ms after the last final")
+        for key, (expected, actual) in failures.items():
+            print(f"     {key}: expected {expected}, got {actual}")
+        failed += bool(failures)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--debounce", type=float, default=0.6)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--token-rate", type=float, default=60.0)
+    parser.add_argument("--tokens", type=int, default=90)
+    parser.add_argument("--tokens-per-sentence", type=int, default=15)
+    parser.add_argument("--sentence-seconds", type=float, default=2.0)
+    failed = asyncio.run(main_async(parser.parse_args()))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
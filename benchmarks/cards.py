@@ -0,0 +1,101 @@
+"""Prompt context from project cards vs the per-turn metadata walk it replaced.
+
+    python -m benchmarks.cards --repeat 2000
+
+For each query and ``k`` the same retrieved chunks are turned into prompt
+context both ways: ``walk`` appends every chunk's text and collects every
+image in its metadata, ``cards`` puts each project's card in once and takes
+capped, ranked images from it. Tokens cover the context and image lines,
+CPU is per-turn ``process_time`` and memory the tracemalloc peak of one turn.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.retrieval import QUERIES
+from benchmarks.stubs import HashEmbeddings
+from cards import CardStore
+from catalog import load_catalog
+from ingest import INDEX_DIR
+from prompting import count_tokens
+
+
+def walk_context(docs):
+    """``_prepare_turn``'s context and image lines before project cards."""
+    context_text = []
+    image_pool = set()
+    for doc in docs:
+        context_text.append(doc.page_content)
+        if doc.metadata.get("type") == "project":
+            images = doc.metadata.get("images", {})
+            for label, urls in images.items():
+                if not isinstance(urls, list):
+                    urls = [urls]
+                for url in urls:
+                    image_pool.add(f"- {label}: {url.strip()}")
+    return context_text, sorted(image_pool)
+
+
+def measure(build, docs, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        chunks, images = build(docs)
+    cpu_us = (time.process_time() - start) / repeat * 1e6
+    tracemalloc.start()
+    build(docs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tokens = count_tokens("\n\n".join(chunks)) + count_tokens("\n".join(images))
+    return {"tokens": tokens, "chunks": len(chunks), "images": len(images), "cpu_us": cpu_us, "peak_kb": peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=INDEX_DIR)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--k", type=int, nargs="+", default=[6, 15])
+    args = parser.parse_args()
+
+    from docstore import load_vector_store
+
+    embedder = HashEmbeddings()
+    store = load_vector_store(args.index, embedder)
+    data = load_catalog()
+
+    tracemalloc.start()
+    start = time.process_time()
+    cards = CardStore.from_catalog(data)
+    built_ms = (time.process_time() - start) * 1000
+    resident = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{len(cards)} cards built in {built_ms:.1f} ms CPU, {resident / 1024:.1f} KB resident\n")
+
+    header = f"{'k':>3} {'query':<44}"
+    for name in ("walk", "cards"):
+        header += f" | {name + ' tok':>9} {'chunks':>6} {'imgs':>4} {'cpu us':>7} {'peak KB':>7}"
+    print(header)
+    for k in args.k:
+        totals = {"walk": [0, 0.0], "cards": [0, 0.0]}
+        for query in QUERIES:
+            docs = store.similarity_search_by_vector(embedder.embed_query(query), k=k)
+            row = f"{k:>3} {query[:44]:<44}"
+            for name, build in (("walk", walk_context), ("cards", cards.context)):
+                result = measure(build, docs, args.repeat)
+                totals[name][0] += result["tokens"]
+                totals[name][1] += result["cpu_us"]
+                row += (
+                    f" | {result['tokens']:>9} {result['chunks']:>6} {result['images']:>4} "
+                    f"{result['cpu_us']:>7.1f} {result['peak_kb']:>7.1f}"
+                )
+            print(row)
+        n = len(QUERIES)
+        print(
+            f"k={k}: context tokens per turn walk {totals['walk'][0] / n:.0f}, "
+            f"cards {totals['cards'][0] / n:.0f}; "
+            f"CPU walk {totals['walk'][1] / n:.1f} us, cards {totals['cards'][1] / n:.1f} us\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""End-to-end latency of scripted conversations with every external service stubbed.
+
+    python -m benchmarks.e2e                                   # all passes, saved by commit
+    python -m benchmarks.e2e --mode text --compare benchmarks/results/1a2b3c4.json
+
+Runs the real pipeline against the shipped FAISS index and mumbaidata.json.
+OpenAI is replaced by ``StubChatModel`` (``--ttft``, ``--token-rate``) and
+``HashEmbeddings``. Voice mode (needs livekit-agents) runs
+``voiceagent.converse``, the worker's per-participant loop, on a ``StubSTT``
+transcript replay in place of the Deepgram stream, with ``StubTTS`` as
+``voiceagent.make_tts`` and a ``StubAudioSource``. Hash embeddings are not ada
+embeddings, so unfiltered search results are arbitrary, but deterministic.
+
+Passes:
+  text         generate_response latency and prompt tokens per turn
+  memory       tracemalloc growth per turn over a text pass
+  voice        end of speech to first audio, per stage, one conversation at a time
+  concurrency  voice conversations side by side: turns per second, p95 first audio
+
+Results go to benchmarks/results/<commit>.json, voice turn traces next to it
+(readable with ``python tracing.py``).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from benchmarks.stubs import HashEmbeddings, StubAudioSource, StubChatModel, StubSTT, StubTTS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONVERSATIONS_PATH = os.path.join(HERE, "conversations.jsonl")
+RESULTS_DIR = os.path.join(HERE, "results")
+
+
+def load_conversations(path=CONVERSATIONS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_reply(sentences):
+    answer = " ".join(
+        f"Point {i + 1}: this project fits your budget, has good connectivity and "
+        "offers amenities like a pool and a clubhouse."
+        for i in range(sentences)
+    )
+    return json.dumps({"answer": answer, "image_urls": []})
+
+
+def summarize(values):
+    if not values:
+        return {"n": 0}
+    ordered = sorted(values)
+    return {
+        "n": len(ordered),
+        "mean": round(statistics.fmean(ordered), 2),
+        "p50": round(ordered[len(ordered) // 2], 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+    }
+
+
+def install_stubs(args):
+    import bot
+
+    bot.llm = StubChatModel(make_reply(args.sentences), args.ttft, args.token_rate)
+    bot.summary_llm = StubChatModel("Caller wants a flat in Mumbai.", args.ttft, args.token_rate)
+    bot.embedding = HashEmbeddings(latency=args.embed_latency)
+    bot.load_resources()
+    return bot
+
+
+def reset_caches(bot):
+    bot.clear_caches()
+
+
+def run_text(bot, conversations):
+    from langid import LanguageState
+    from prompting import ConversationMemory
+
+    report = {}
+    for conv in conversations:
+        reset_caches(bot)
+        history, memory, slots, state = [], ConversationMemory(), {}, LanguageState()
+        latencies, tokens = [], []
+        for text in conv["turns"]:
+            history.append({"role": "user", "content": text})
+            start = time.perf_counter()
+            result = bot.generate_response(
+                history, language_state=state, memory=memory, slots=slots
+            )
+            latencies.append(1000 * (time.perf_counter() - start))
+            tokens.append(result["prompt_tokens"]["total"])
+            history.append({"role": "assistant", "content": result["text"]})
+        report[conv["name"]] = {"latency_ms": summarize(latencies), "prompt_tokens": summarize(tokens)}
+    return report
+
+
+def run_memory(bot, conversations, rounds):
+    from langid import LanguageState
+    from prompting import ConversationMemory
+
+    llm, bot.llm = bot.llm, StubChatModel(bot.llm.reply)
+    summary_llm, bot.summary_llm = bot.summary_llm, StubChatModel(bot.summary_llm.reply)
+    reset_caches(bot)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        turns = 0
+        for _ in range(rounds):
+            for conv in conversations:
+                history, memory, slots, state = [], ConversationMemory(), {}, LanguageState()
+                for text in conv["turns"]:
+                    history.append({"role": "user", "content": text})
+                    result = bot.generate_response(
+                        history, language_state=state, memory=memory, slots=slots
+                    )
+                    history.append({"role": "assistant", "content": result["text"]})
+                    turns += 1
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        bot.llm, bot.summary_llm = llm, summary_llm
+    return {
+        "turns": turns,
+        "growth_kb": round((current - baseline) / 1024, 1),
+        "growth_kb_per_turn": round((current - baseline) / 1024 / turns, 2),
+        "peak_kb": round((peak - baseline) / 1024, 1),
+    }
+
+
+async def voice_conversation(voiceagent, conv, room, args, stt_options=None, **converse_kwargs):
+    identity = "caller"
+    session = voiceagent.sessions.get(room, identity)
+
+    async def wait_turn(i):
+        # Speak again only once the previous reply has been said.
+        while sum(m["role"] == "assistant" for m in session.history) < i:
+            await asyncio.sleep(0.01)
+
+    stt_stream = StubSTT(
+        conv["turns"], conv["language"], wait_turn=wait_turn, **(stt_options or {})
+    ).stream()
+    try:
+        return await voiceagent.converse(
+            stt_stream,
+            StubAudioSource(speed=args.playback_speed),
+            room,
+            identity,
+            debounce=args.debounce,
+            drain=True,
+            **converse_kwargs,
+        )
+    finally:
+        voiceagent.sessions.close(room, identity)
+
+
+def read_traces(path, room_prefix):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        traces = [json.loads(line) for line in f if line.strip()]
+    return [t for t in traces if t["attrs"].get("room", "").startswith(room_prefix)]
+
+
+def _first_audio_ms(trace):
+    for span in trace["spans"]:
+        if span["stage"] == "tts_first_byte":
+            return span["offset_ms"] + span["duration_ms"]
+    return None
+
+
+def voice_report(traces):
+    stages = {}
+    for trace in traces:
+        for span in trace["spans"]:
+            stages.setdefault(span["stage"], []).append(span["duration_ms"])
+    first_audio = [ms for ms in map(_first_audio_ms, traces) if ms is not None]
+    tokens = [
+        span["tokens"] for t in traces for span in t["spans"] if span["stage"] == "build_prompt"
+    ]
+    return {
+        "first_audio_ms": summarize(first_audio),
+        "prompt_tokens": summarize(tokens),
+        "stages_p50_ms": {stage: summarize(values)["p50"] for stage, values in stages.items()},
+    }
+
+
+def setup_voice(args, traces_path):
+    import tracing
+    import voiceagent
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Synthesis is compressed in time along with playback; first byte is not.
+    tts = StubTTS(first_byte=args.tts_first_byte, realtime_factor=4.0 * args.playback_speed)
+    voiceagent.make_tts = lambda language: tts
+    tracing.TRACE_ENABLED = True
+    tracing.TRACE_PATH = traces_path
+    return voiceagent
+
+
+async def run_voice(voiceagent, bot, conversations, args, traces_path):
+    report = {}
+    for conv in conversations:
+        reset_caches(bot)
+        room = f"e2e-voice-{conv['name']}"
+        metrics = await voice_conversation(voiceagent, conv, room, args)
+        report[conv["name"]] = {
+            **voice_report(read_traces(traces_path, room)),
+            "interruptions": metrics.interruptions,
+        }
+    return report
+
+
+async def run_concurrency(voiceagent, bot, conversations, args, traces_path):
+    report = []
+    for level in args.concurrency:
+        reset_caches(bot)
+        prefix = f"e2e-c{level}-"
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                voice_conversation(voiceagent, conversations[i % len(conversations)], f"{prefix}{i}", args)
+                for i in range(level)
+            )
+        )
+        wall = time.perf_counter() - start
+        turns = sum(metrics.turns for metrics in results)
+        voice = voice_report(read_traces(traces_path, prefix))
+        report.append(
+            {
+                "concurrency": level,
+                "turns": turns,
+                "turns_per_second": round(turns / wall, 3),
+                "first_audio_ms": voice["first_audio_ms"],
+                "interruptions": sum(metrics.interruptions for metrics in results),
+            }
+        )
+    return report
+
+
+async def run_voice_passes(voiceagent, bot, conversations, args, traces_path):
+    # One event loop for both: the session manager's semaphore binds to it.
+    return {
+        "voice": await run_voice(voiceagent, bot, conversations, args, traces_path),
+        "concurrency": await run_concurrency(voiceagent, bot, conversations, args, traces_path),
+    }
+
+
+def commit_id():
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{sha}-dirty" if dirty else sha
+
+
+def flatten(data, prefix=""):
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for item in data:
+            label = f"c{item['concurrency']}" if isinstance(item, dict) and "concurrency" in item else ""
+            flat.update(flatten(item, f"{prefix}{label}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix.rstrip(".")] = data
+    return flat
+
+
+def compare(old, new):
+    before, after = flatten(old["results"]), flatten(new["results"])
+    print(f"\n{'metric':<58} {old['commit']:>14} {new['commit']:>14} {'change':>8}")
+    for key in sorted(before.keys() & after.keys()):
+        if key.endswith(".n"):
+            continue
+        change = f"{100 * (after[key] - before[key]) / before[key]:+.1f}%" if before[key] else ""
+        print(f"{key:<58} {before[key]:>14} {after[key]:>14} {change:>8}")
+
+
+def print_results(results):
+    for name, value in results.items():
+        print(f"\n== {name}")
+        print(json.dumps(value, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["text", "voice", "all"], default="all")
+    parser.add_argument("--conversations", default=CONVERSATIONS_PATH)
+    parser.add_argument("--ttft", type=float, default=0.35)
+    parser.add_argument("--token-rate", type=float, default=80.0)
+    parser.add_argument("--sentences", type=int, default=3)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--tts-first-byte", type=float, default=0.2)
+    parser.add_argument("--debounce", type=float, default=0.6)
+    parser.add_argument("--playback-speed", type=float, default=10.0)
+    parser.add_argument("--memory-rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    conversations = load_conversations(args.conversations)
+    commit = commit_id()
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}.json")
+    traces_path = os.path.splitext(out)[0] + "-traces.jsonl"
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    if os.path.exists(traces_path):
+        os.remove(traces_path)
+
+    bot = install_stubs(args)
+    results = {}
+    if args.mode in ("text", "all"):
+        results["text"] = run_text(bot, conversations)
+        results["memory"] = run_memory(bot, conversations, args.memory_rounds)
+    if args.mode in ("voice", "all"):
+        voiceagent = setup_voice(args, traces_path)
+        results.update(asyncio.run(run_voice_passes(voiceagent, bot, conversations, args, traces_path)))
+    results["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    saved = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(saved, f, indent=2, ensure_ascii=False)
+    print_results(results)
+    print(f"\nSaved {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), saved)
+
+
+if __name__ == "__main__":
+    main()
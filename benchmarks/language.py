@@ -0,0 +1,117 @@
+"""Accuracy and latency of local language identification vs the LLM detector.
+
+    python -m benchmarks.language          # local identifier only
+    python -m benchmarks.language --llm    # also call bot.detect_language_llm
+
+The samples are held out from ``langid._SEED``: the run refuses a sample that
+shares a three-word sequence with the seed text. Single utterances measure the
+cold, first-turn decision; the conversations replay whole calls through one
+``LanguageState`` each, counting language flips against the caller's
+language and how often the LLM fallback is called. Without ``--llm`` the
+fallback is an oracle that returns the expected language, so only its call
+count is measured.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from langid import _SEED, _WORD, CODES, LanguageState
+
+SAMPLES = os.path.join(os.path.dirname(__file__), "language_samples.jsonl")
+CONVERSATIONS = os.path.join(os.path.dirname(__file__), "language_conversations.jsonl")
+
+
+def load_samples(path=SAMPLES):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _shingles(text, n=3):
+    words = _WORD.findall(text.lower())
+    return {tuple(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def seed_overlap(texts):
+    seed = set().union(*(_shingles(text) for text in _SEED.values()))
+    return [text for text in texts if _shingles(text) & seed]
+
+
+def run(name, detect, samples):
+    latencies = []
+    correct = 0
+    misses = []
+    for sample in samples:
+        start = time.perf_counter()
+        predicted = detect(sample["text"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        expected = CODES[sample["language"]]
+        if predicted == expected:
+            correct += 1
+        else:
+            misses.append((sample["text"], expected, predicted))
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<8} accuracy {correct}/{len(samples)} "
+        f"({100 * correct / len(samples):.1f}%)  "
+        f"p50 {statistics.median(latencies):.3f} ms  p95 {p95:.3f} ms"
+    )
+    for text, expected, predicted in misses:
+        print(f"    miss: expected {expected} got {predicted}: {text}")
+
+
+def run_conversations(name, conversations, fallback=None):
+    turns = flips = fallbacks = 0
+    for conversation in conversations:
+        state = LanguageState()
+        for turn in conversation["turns"]:
+            expected = CODES[turn["language"]]
+            predicted = state.detect(turn["text"], fallback=fallback or (lambda text: expected))
+            turns += 1
+            if predicted != expected:
+                flips += 1
+                print(f"    {conversation['name']}: expected {expected} got {predicted}: {turn['text']}")
+        fallbacks += state.fallbacks
+    print(
+        f"{name:<8} conversations {len(conversations)}  turns {turns}  "
+        f"wrong language {flips}  LLM fallback {fallbacks}/{turns} ({100 * fallbacks / turns:.1f}%)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", default=SAMPLES)
+    parser.add_argument("--conversations", default=CONVERSATIONS)
+    parser.add_argument(
+        "--llm", action="store_true", help="also benchmark the LLM detector"
+    )
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    conversations = load_samples(args.conversations)
+    texts = [s["text"] for s in samples] + [t["text"] for c in conversations for t in c["turns"]]
+    overlap = seed_overlap(texts)
+    if overlap:
+        sys.exit("samples overlap langid._SEED:\n" + "\n".join(f"    {text}" for text in overlap))
+
+    # A fresh state per utterance measures the cold, first-turn decision; a
+    # fallback there counts as a miss for the local identifier.
+    fallbacks = []
+    run("local", lambda text: LanguageState().detect(text, fallback=fallbacks.append), samples)
+    print(f"{'':<8} LLM fallback {len(fallbacks)}/{len(samples)} utterances")
+    run_conversations("local", conversations)
+
+    if args.llm:
+        from bot import detect_language_llm
+
+        run("llm", detect_language_llm, samples)
+        run_conversations("llm", conversations, fallback=detect_language_llm)
+
+
+if __name__ == "__main__":
+    main()
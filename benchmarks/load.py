@@ -0,0 +1,129 @@
+"""Load test: N simulated rooms through the worker's real turn loop.
+
+    python -m benchmarks.load --rooms 50 --turns 5 --max-inflight 8
+
+The worker runs one job (one room) per process, so each room here runs in its
+own forked process with its own event loop and ``SessionManager``, like a job
+does. Every room runs ``voiceagent.converse`` (the per-participant loop the
+worker uses, down to ``speak_response`` and ``stream_response``) on a
+``StubSTT`` replay, with the e2e benchmark's stub chat model, hash
+embeddings, ``StubTTS`` and ``StubAudioSource``. Latency is end of speech to
+first audio, from the turn traces; each room's utterances carry its name, so
+a session that saw another room's turns shows up as an isolation failure.
+Needs livekit-agents and a platform with ``fork``.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.e2e import install_stubs, read_traces, setup_voice, voice_report
+from benchmarks.stubs import StubAudioSource, StubSTT
+from sessions import SessionManager
+
+QUESTION = "Worli mein 3 BHK ka price kya hai?"
+
+# Set in the parent before forking; the rooms inherit them.
+_VOICEAGENT = None
+_ARGS = None
+_TRACES_DIR = None
+
+
+async def simulate_room(voiceagent, room, args):
+    identity = "caller"
+    session = voiceagent.sessions.get(room, identity)
+    utterances = [f"{room} turn {turn}: {QUESTION}" for turn in range(args.turns)]
+
+    async def wait_turn(i):
+        while sum(m["role"] == "assistant" for m in session.history) < i:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(args.think_time)
+
+    stt_stream = StubSTT(utterances, "hi", wait_turn=wait_turn).stream()
+    metrics = await voiceagent.converse(
+        stt_stream,
+        StubAudioSource(speed=args.playback_speed),
+        room,
+        identity,
+        debounce=args.debounce,
+        drain=True,
+    )
+    foreign = [
+        m["content"]
+        for m in session.history
+        if m["role"] == "user" and not m["content"].startswith(f"{room} turn")
+    ]
+    return metrics, foreign
+
+
+def run_job(room):
+    """One room in a forked process, as the worker runs a job."""
+    import tracing
+
+    voiceagent, args = _VOICEAGENT, _ARGS
+    tracing.TRACE_PATH = os.path.join(_TRACES_DIR, f"{room}.jsonl")
+    voiceagent.sessions = SessionManager(max_inflight=args.max_inflight)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    metrics, foreign = asyncio.run(simulate_room(voiceagent, room, args))
+    session_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return metrics.turns, bool(foreign), session_bytes, rss_kb
+
+
+def main_jobs(args, traces_dir):
+    global _VOICEAGENT, _ARGS, _TRACES_DIR
+    _VOICEAGENT = setup_voice(args, os.path.join(traces_dir, "parent.jsonl"))
+    _ARGS, _TRACES_DIR = args, traces_dir
+
+    rooms = [f"load-{i}" for i in range(args.rooms)]
+    start = time.perf_counter()
+    with multiprocessing.get_context("fork").Pool(processes=args.rooms) as pool:
+        results = pool.map(run_job, rooms)
+    elapsed = time.perf_counter() - start
+
+    traces = [t for room in rooms for t in read_traces(os.path.join(traces_dir, f"{room}.jsonl"), room)]
+    first_audio = voice_report(traces)["first_audio_ms"]
+    turns = sum(result[0] for result in results)
+    leaked = sum(result[1] for result in results)
+    per_session = sum(result[2] for result in results) / len(results)
+    rss_mb = max(result[3] for result in results) / 1024
+
+    print(f"rooms {args.rooms} (one process each)  turns/room {args.turns}  max in-flight {args.max_inflight} per room")
+    print(
+        f"first audio   p50 {first_audio['p50']:.0f} ms  p95 {first_audio['p95']:.0f} ms  "
+        f"(n={first_audio['n']})"
+    )
+    print(f"throughput    {turns / elapsed:.1f} turns/s over {elapsed:.1f} s")
+    print(f"memory        {per_session / 1024:.1f} KiB per session, peak RSS {rss_mb:.0f} MiB per job process")
+    print(f"isolation     {'ok' if not leaked else f'{leaked} rooms saw foreign turns'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--max-inflight", type=int, default=8)
+    parser.add_argument("--think-time", type=float, default=0.5)
+    parser.add_argument("--ttft", type=float, default=0.35)
+    parser.add_argument("--token-rate", type=float, default=80.0)
+    parser.add_argument("--sentences", type=int, default=3)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--tts-first-byte", type=float, default=0.2)
+    parser.add_argument("--debounce", type=float, default=0.6)
+    parser.add_argument("--playback-speed", type=float, default=10.0)
+    args = parser.parse_args()
+
+    install_stubs(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        main_jobs(args, tmp)
+
+
+if __name__ == "__main__":
+    main()
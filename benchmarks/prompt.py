@@ -0,0 +1,62 @@
+"""Prompt tokens per turn over a long call: inlined history vs budgeted builder.
+
+    python -m benchmarks.prompt --turns 40
+"""
+
+import argparse
+
+from prompting import (
+    PERSONA_PROMPT,
+    ConversationMemory,
+    build_messages,
+    count_tokens,
+    format_messages,
+    format_report,
+)
+
+USER = "Mujhe Worli mein sea view wala 3 BHK chahiye, budget around 8 crore hai. "
+ASSISTANT = (
+    "Worli offers some of Mumbai's most iconic sea-facing residences, with "
+    "thoughtfully designed three bedroom homes and a wonderful clubhouse. "
+    "Would you like me to share a few options that fit your budget? "
+)
+SUMMARY = "Client wants a 3 BHK sea view home in Worli around 8 crore."
+CHUNK = "Project: Example Residences\nDeveloper: Example Group\n" + "Amenities: pool, gym, spa. " * 40
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--chunks", type=int, default=15)
+    args = parser.parse_args()
+
+    history = []
+    memory = ConversationMemory()
+    chunks = [CHUNK] * args.chunks
+    old_total = new_total = 0
+    for turn in range(1, args.turns + 1):
+        history.append({"role": "user", "content": USER})
+        # Previous behaviour: history inlined into the prompt and sent again
+        # as separate messages, with every retrieved chunk.
+        old = (
+            count_tokens(PERSONA_PROMPT)
+            + 2 * count_tokens(format_messages(history[:-1]))
+            + count_tokens("\n".join(chunks))
+            + count_tokens(USER)
+        )
+        _, report = build_messages(
+            USER, history[:-1], chunks, [], "hi", True, summary=memory.summary
+        )
+        history.append({"role": "assistant", "content": ASSISTANT})
+        memory.update(history, lambda summary, messages: SUMMARY)
+
+        old_total += old
+        new_total += report["total"]
+        if turn == 1 or turn % 10 == 0:
+            print(f"turn {turn:>3}  inlined {old:>6}  budgeted {report['total']:>6}  | {format_report(report)}")
+
+    print(f"cumulative input tokens: inlined {old_total}, budgeted {new_total}")
+
+
+if __name__ == "__main__":
+    main()
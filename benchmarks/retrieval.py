@@ -0,0 +1,112 @@
+"""Prompt context size and retrieval latency: k=15 search vs slot pre-filtering.
+
+    python -m benchmarks.retrieval --repeat 50
+
+Query embeddings come from a local hash embedder, so the numbers measure the
+FAISS and filtering work rather than the embedding API. The session checks
+replay a few turns through one slot dict and report which locality was kept,
+which filters were relaxed and how many documents came back; a session turn
+that finds nothing fails the run.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks.stubs import HashEmbeddings
+from catalog import load_catalog
+from filters import ProjectIndex, extract_slots, filtered_search
+from ingest import INDEX_DIR
+from prompting import count_tokens
+
+QUERIES = [
+    "I want a 3 BHK in Worli under 8 crore",
+    "Mera budget paanch crore hai, Powai mein kya options hain?",
+    "Show me 2 BHK flats in Powai",
+    "Anything above 40 crore with a sea view?",
+    "मुझे वर्ली में 4 BHK चाहिए",
+    "Tell me about amenities in your projects",
+]
+
+# Turns of one session, with the locality each should leave in the slots.
+SESSIONS = [
+    [("Andheri mein kuch hai kya?", "Andheri West"), ("What amenities do you have?", "Andheri West")],
+    [("I don't want Worli, show me Powai", "Powai")],
+    [("Andheri East mein 2 BHK chahiye", None)],
+    [("Worli mein 50 lakh ka 2 BHK", "Worli"), ("Lower Parel mein?", "Lower Parel")],
+]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=INDEX_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--k", type=int, default=6)
+    args = parser.parse_args()
+
+    from docstore import load_vector_store
+
+    embedder = HashEmbeddings()
+    store = load_vector_store(args.index, embedder)
+    index = ProjectIndex.from_vector_store(store, load_catalog())
+
+    print(f"{'query':<60} {'k=15 ms':>8} {'tokens':>7}  {'filtered ms':>11} {'tokens':>7}")
+    totals = [0, 0]
+    for query in QUERIES:
+        baseline, baseline_ms = timed(
+            lambda: store.similarity_search_by_vector(embedder.embed_query(query), k=15), args.repeat
+        )
+
+        def filtered():
+            slots = extract_slots(query, {}, index.localities)
+            allowed, _ = index.select_relaxed(slots)
+            vector = embedder.embed_query(query)
+            if allowed is None:
+                return store.similarity_search_by_vector(vector, k=args.k)
+            return filtered_search(store, vector, allowed, args.k)
+
+        docs, filtered_ms = timed(filtered, args.repeat)
+        baseline_tokens = count_tokens("\n".join(d.page_content for d in baseline))
+        filtered_tokens = count_tokens("\n".join(d.page_content for d in docs))
+        totals[0] += baseline_tokens
+        totals[1] += filtered_tokens
+        print(
+            f"{query[:60]:<60} {baseline_ms:>8.2f} {baseline_tokens:>7}  "
+            f"{filtered_ms:>11.2f} {filtered_tokens:>7}"
+        )
+    print(f"context tokens per turn: k=15 {totals[0] / len(QUERIES):.0f}, filtered {totals[1] / len(QUERIES):.0f}")
+
+    print(f"\n{'session turn':<40} {'locality':<14} {'relaxed':<34} {'docs':>4}")
+    failures = 0
+    for turns in SESSIONS:
+        slots = {}
+        for query, locality in turns:
+            extract_slots(query, slots, index.localities)
+            allowed, relaxed = index.select_relaxed(slots)
+            vector = embedder.embed_query(query)
+            if allowed is None:
+                docs = store.similarity_search_by_vector(vector, k=args.k)
+            else:
+                docs = filtered_search(store, vector, allowed, args.k)
+            ok = docs and slots.get("locality") == locality
+            failures += not ok
+            print(
+                f"{query[:40]:<40} {str(slots.get('locality')):<14} "
+                f"{', '.join(relaxed) or '-':<34} {len(docs):>4}{'' if ok else '  FAIL'}"
+            )
+    if failures:
+        sys.exit(f"{failures} session turns failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Time from end of speech to the LLM call, with and without speculative retrieval.
+
+    python -m benchmarks.speculation --embed-latency 0.3
+
+Replays the scripted conversations through ``voiceagent.converse`` with the
+stubs of ``benchmarks.e2e`` (needs livekit-agents), once with speculation off
+and once on, for each of ``SCENARIOS``: steady speech (an interim every 0.4 s,
+so no interim is stable long enough to speculate on), a pause before the
+final (speculation starts on the stable last interim) and a hesitation
+halfway through each utterance (speculation on a partial text, then wasted).
+``--embed-latency`` stands in for the embeddings API round trip, which is
+what speculation hides. Speculation only runs on interims, so its hits are
+turns whose retrieval started before the final; ``wasted`` counts the
+retrievals that were paid for and thrown away. The gap is measured from the caller's last interim
+transcript to the start of the LLM span in each turn's trace.
+
+Before timing, scripted slot changes are run through ``_prepare_turn`` both
+with a speculative result and without; the session slots must come out the
+same, or the run exits non-zero.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+from benchmarks.e2e import (
+    install_stubs,
+    load_conversations,
+    read_traces,
+    reset_caches,
+    setup_voice,
+    summarize,
+    voice_conversation,
+)
+from speculation import SpeculationStats
+
+# StubSTT options per scenario.
+SCENARIOS = {
+    "steady": {},
+    "pause before final": {"final_lag": 0.8},
+    "hesitation": {"hesitation": 0.8},
+}
+
+SLOT_SEQUENCES = [
+    ["I want a flat under 5 crore", "Actually, anything above 20 crore"],
+    ["3 BHK in Worli under 8 crore", "What about Powai?", "Between 2 and 4 crore"],
+    ["Mujhe 4 BHK chahiye", "Worli mein 10 crore se upar", "Powai under 6 crore"],
+]
+
+
+def check_slots(bot):
+    """Turns whose slots differ between the speculative and the normal path."""
+    mismatches = []
+    for utterances in SLOT_SEQUENCES:
+        direct, speculative = {}, {}
+        for text in utterances:
+            history = [{"role": "user", "content": text}]
+            bot._prepare_turn(history, True, slots=direct)
+            retrieved = bot.speculate(text, speculative)
+            bot._prepare_turn(history, True, slots=speculative, retrieved=retrieved)
+            if direct != speculative:
+                mismatches.append((text, dict(direct), dict(speculative)))
+    return mismatches
+
+
+def llm_start_ms(trace):
+    for span in trace["spans"]:
+        if span["stage"] == "llm":
+            return span["offset_ms"]
+    return None
+
+
+async def run(voiceagent, bot, conversations, args, traces_path):
+    results = {}
+    for i, (scenario, stt_options) in enumerate(SCENARIOS.items()):
+        for speculative in (False, True):
+            stats = SpeculationStats()
+            prefix = f"spec-{i}-{'on' if speculative else 'off'}-"
+            for conv in conversations:
+                reset_caches(bot)
+                await voice_conversation(
+                    voiceagent,
+                    conv,
+                    prefix + conv["name"],
+                    args,
+                    stt_options=stt_options,
+                    speculative=speculative,
+                    speculation_stats=stats,
+                )
+            traces = read_traces(traces_path, prefix)
+            gaps = [ms for ms in map(llm_start_ms, traces) if ms is not None]
+            results[scenario, speculative] = (summarize(gaps), stats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--embed-latency", type=float, default=0.3)
+    parser.add_argument("--debounce", type=float, default=0.6)
+    parser.add_argument("--ttft", type=float, default=0.35)
+    parser.add_argument("--token-rate", type=float, default=80.0)
+    parser.add_argument("--sentences", type=int, default=2)
+    parser.add_argument("--tts-first-byte", type=float, default=0.2)
+    parser.add_argument("--playback-speed", type=float, default=10.0)
+    args = parser.parse_args()
+
+    traces_path = os.path.join(tempfile.mkdtemp(prefix="speculation-"), "traces.jsonl")
+    bot = install_stubs(args)
+    mismatches = check_slots(bot)
+    for text, direct, speculative in mismatches:
+        print(f"FAIL slots after {text!r}: normal {direct}, speculative {speculative}")
+    if mismatches:
+        sys.exit(1)
+    print(f"slots: speculative and normal paths agree on {len(SLOT_SEQUENCES)} scripts")
+
+    voiceagent = setup_voice(args, traces_path)
+    results = asyncio.run(run(voiceagent, bot, load_conversations(), args, traces_path))
+
+    print(f"end of speech -> LLM call, embedding latency {1000 * args.embed_latency:.0f}ms")
+    for scenario in SCENARIOS:
+        print(f"\n{scenario}")
+        for speculative in (False, True):
+            gap, stats = results[scenario, speculative]
+            label = "speculative" if speculative else "baseline   "
+            print(f"  {label}  p50 {gap['p50']:>7.1f}ms  p95 {gap['p95']:>7.1f}ms  (n={gap['n']})")
+            if speculative:
+                print(f"               {stats}")
+        saved = results[scenario, False][0]["p50"] - results[scenario, True][0]["p50"]
+        print(f"  p50 saved: {saved:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Cold start cost: module import, time to ready and the first turn.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --live      # real OpenAI clients and embeddings
+
+Every run starts a fresh interpreter. ``import`` is the time to import
+``bot``; ``ready`` is ``bot.load_resources()`` (what the worker's prewarm step
+does); ``first turn`` and ``second turn`` are ``generate_response`` calls, so
+their difference is the set-up still left on the first caller's path. Offline
+runs swap in a stub chat model and hash embeddings against the real index.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+QUESTIONS = [
+    "Worli mein 3 BHK ka price kya hai?",
+    "What amenities does Lodha World One have?",
+]
+
+
+def child(live):
+    start = time.perf_counter()
+    import bot
+
+    imported = time.perf_counter()
+    if not live:
+        from benchmarks.stubs import HashEmbeddings, StubChatModel
+
+        bot.llm = bot.summary_llm = StubChatModel()
+        bot.embedding = HashEmbeddings()
+    bot.load_resources()
+    ready = time.perf_counter()
+
+    turns = []
+    history = []
+    for question in QUESTIONS:
+        history.append({"role": "user", "content": question})
+        turn_start = time.perf_counter()
+        result = bot.generate_response(history)
+        turns.append(time.perf_counter() - turn_start)
+        history.append({"role": "assistant", "content": result["text"]})
+
+    print(
+        json.dumps(
+            {
+                "import": imported - start,
+                "ready": ready - imported,
+                "first turn": turns[0],
+                "second turn": turns[1],
+                "peak rss mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.live)
+        return
+
+    command = [sys.executable, "-m", "benchmarks.startup", "--child"]
+    if args.live:
+        command.append("--live")
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run(command, capture_output=True, text=True, env=os.environ)
+        if out.returncode:
+            sys.exit(out.stderr)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'stage':<14} {'median':>9} {'max':>9}")
+    for stage in runs[0]:
+        values = [run[stage] for run in runs]
+        unit = "" if stage.endswith("mb") else " s"
+        print(f"{stage:<14} {statistics.median(values):>9.3f} {max(values):>9.3f}{unit}")
+
+
+if __name__ == "__main__":
+    main()
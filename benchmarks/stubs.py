@@ -0,0 +1,238 @@
+"""Offline stand-ins for the LLM, STT and TTS backends used by the benchmarks."""
+
+import asyncio
+import hashlib
+import math
+import re
+import time
+
+
+class HashEmbeddings:
+    """Deterministic bag-of-words embeddings built from token hashes.
+
+    ``latency`` seconds are spent per call, standing in for the API round trip.
+    """
+
+    def __init__(self, dim=1536, latency=0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def embed_query(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        vector = [0.0] * self.dim
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class StubMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubChatModel:
+    """Offline stand-in for ``ChatOpenAI`` answering every prompt with ``reply``.
+
+    The first token arrives after ``ttft`` seconds and the rest at
+    ``token_rate`` tokens per second (instantly when the rate is 0). Tokens are
+    whitespace-delimited words.
+    """
+
+    def __init__(self, reply='{"answer": "Happy to help.", "image_urls": []}', ttft=0.0, token_rate=0.0):
+        self.reply = reply
+        self.ttft = ttft
+        self.token_rate = token_rate
+        self._tokens = re.findall(r"\S+\s*", reply)
+
+    def _duration(self):
+        return self.ttft + (len(self._tokens) / self.token_rate if self.token_rate else 0.0)
+
+    def bind(self, **kwargs):
+        return self
+
+    def invoke(self, messages):
+        time.sleep(self._duration())
+        return StubMessage(self.reply)
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self._duration())
+        return StubMessage(self.reply)
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.ttft)
+        for i, token in enumerate(self._tokens):
+            if i and self.token_rate:
+                await asyncio.sleep(1 / self.token_rate)
+            yield StubMessage(token)
+
+
+class StubSTT:
+    """Replays scripted utterances as a live transcription stream would.
+
+    Each utterance is spoken at ``words_per_second``: an interim transcript per
+    word, then the final ``final_lag`` seconds after the last word. With
+    ``hesitation``, the caller stops for that many seconds halfway through
+    each utterance. Before utterance ``i`` the stream awaits ``wait_turn(i)``
+    (e.g. until the previous reply was spoken) and then ``pause`` seconds.
+    """
+
+    def __init__(
+        self,
+        utterances,
+        language,
+        wait_turn=None,
+        words_per_second=2.5,
+        final_lag=0.15,
+        pause=0.5,
+        hesitation=0.0,
+    ):
+        self.utterances = utterances
+        self.language = language
+        self.wait_turn = wait_turn
+        self.words_per_second = words_per_second
+        self.final_lag = final_lag
+        self.pause = pause
+        self.hesitation = hesitation
+
+    def stream(self):
+        return self
+
+    def push_frame(self, frame):
+        pass
+
+    def __aiter__(self):
+        return self._events()
+
+    def _event(self, kind, text):
+        from livekit.agents import stt
+
+        return stt.SpeechEvent(
+            type=kind, alternatives=[stt.SpeechData(language=self.language, text=text)]
+        )
+
+    async def _events(self):
+        from livekit.agents import stt
+
+        for i, utterance in enumerate(self.utterances):
+            if self.wait_turn is not None:
+                await self.wait_turn(i)
+            await asyncio.sleep(self.pause)
+            words = utterance.split()
+            for n in range(1, len(words) + 1):
+                await asyncio.sleep(1 / self.words_per_second)
+                if n == len(words) // 2 + 1:
+                    await asyncio.sleep(self.hesitation)
+                yield self._event(stt.SpeechEventType.INTERIM_TRANSCRIPT, " ".join(words[:n]))
+            await asyncio.sleep(self.final_lag)
+            yield self._event(stt.SpeechEventType.FINAL_TRANSCRIPT, utterance)
+
+
+class StubFrame:
+    def __init__(self, duration):
+        self.duration = duration
+
+
+class StubAudio:
+    def __init__(self, duration):
+        self.frame = StubFrame(duration)
+
+
+class StubTTS:
+    """Stand-in for ``elevenlabs.TTS``: synthesises timed frames for pushed text.
+
+    The first frame of a stream comes ``first_byte`` seconds after its first
+    flushed text. Speech lasts ``len(text) / chars_per_second`` seconds and is
+    produced ``realtime_factor`` times faster than it plays.
+    """
+
+    def __init__(self, first_byte=0.2, chars_per_second=15.0, realtime_factor=4.0, frame_seconds=0.1):
+        self.first_byte = first_byte
+        self.chars_per_second = chars_per_second
+        self.realtime_factor = realtime_factor
+        self.frame_seconds = frame_seconds
+
+    def prewarm(self):
+        pass
+
+    def stream(self):
+        return StubTTSStream(self)
+
+    async def aclose(self):
+        pass
+
+
+class StubTTSStream:
+    def __init__(self, tts):
+        self.tts = tts
+        self._pending = ""
+        self._queue = asyncio.Queue()
+
+    def push_text(self, text):
+        self._pending += text
+
+    def flush(self):
+        if self._pending:
+            self._queue.put_nowait(self._pending)
+            self._pending = ""
+
+    def end_input(self):
+        self.flush()
+        self._queue.put_nowait(None)
+
+    async def aclose(self):
+        self._queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        tts = self.tts
+        first = True
+        while True:
+            text = await self._queue.get()
+            if text is None:
+                return
+            if first:
+                await asyncio.sleep(tts.first_byte)
+                first = False
+            seconds = len(text) / tts.chars_per_second
+            frames = max(1, math.ceil(seconds / tts.frame_seconds))
+            for _ in range(frames):
+                await asyncio.sleep(tts.frame_seconds / tts.realtime_factor)
+                yield StubAudio(seconds / frames)
+
+
+class StubAudioSource:
+    """Plays captured frames behind a bounded queue, like ``rtc.AudioSource``.
+
+    Playback runs ``speed`` times faster than real time so long replies do not
+    dominate a benchmark run; ``queued_duration`` is in wall-clock seconds.
+    """
+
+    def __init__(self, queue_seconds=1.0, speed=1.0):
+        self.queue_seconds = queue_seconds
+        self.speed = speed
+        self.frames = 0
+        self._play_until = 0.0
+
+    @property
+    def queued_duration(self):
+        return max(0.0, self._play_until - asyncio.get_running_loop().time())
+
+    async def capture_frame(self, frame):
+        now = asyncio.get_running_loop().time()
+        self._play_until = max(now, self._play_until) + frame.duration / self.speed
+        self.frames += 1
+        wait = self._play_until - now - self.queue_seconds
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def clear_queue(self):
+        self._play_until = 0.0
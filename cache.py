@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger("cache")
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+
+_FILLERS = {"um", "umm", "uh", "uhh", "uhm", "hmm", "er", "erm", "ah"}
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_query(text):
+    """Canonical form of an utterance for exact-match caching.
+
+    Case, punctuation, filler words and spacing differences that speech to
+    text introduces between otherwise identical questions are removed.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    words = _PUNCTUATION.sub(" ", text).split()
+    return " ".join(w for w in words if w not in _FILLERS)
+
+
+# Files of a saved index whose content the cached retrievals depend on: the
+# vectors, the documents returned and the embedding model in the manifest.
+INDEX_FILES = ("index.faiss", "docstore.jsonl", "manifest.json")
+
+
+def index_version(index_dir):
+    """Content hash of a saved index, used to invalidate caches."""
+    digest = hashlib.sha256()
+    for name in INDEX_FILES:
+        path = os.path.join(index_dir, name)
+        if not os.path.exists(path):
+            continue
+        digest.update(name.encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class CacheStats:
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "evictions": self.evictions,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    def __str__(self):
+        return (
+            f"{self.name}: {self.hits}/{self.hits + self.misses} hits "
+            f"({100 * self.hit_rate:.0f}%), {self.evictions} evictions, "
+            f"{self.saved_seconds:.2f}s saved"
+        )
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    ``put`` takes the time it cost to compute the value; every hit adds that
+    cost to ``stats.saved_seconds``.
+    """
+
+    def __init__(self, name, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats(name)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl:
+                del self._entries[key]
+                self.stats.evictions += 1
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            self.stats.saved_seconds += entry[1]
+            return entry[0]
+
+    def put(self, key, value, cost=0.0):
+        with self._lock:
+            self._entries[key] = (value, cost, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SemanticCache:
+    """Retrieval bundles shared across sessions, matched by embedding similarity.
+
+    Entries live in SQLite so every worker process on the host can reuse
+    them. A lookup hits when a stored query with the same ``filter_key`` has
+    cosine similarity of at least ``threshold``. Entries written against a
+    different ``version`` of the index are dropped when the cache is opened.
+    """
+
+    def __init__(
+        self,
+        path,
+        version,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        maxsize=SEMANTIC_CACHE_SIZE,
+    ):
+        import numpy as np
+
+        self._np = np
+        self.version = version
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.stats = CacheStats("semantic")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bundles (id INTEGER PRIMARY KEY, version TEXT, "
+            "filter_key TEXT, vector BLOB, bundle TEXT, cost REAL, created REAL)"
+        )
+        stale = self._conn.execute("DELETE FROM bundles WHERE version != ?", (version,))
+        if stale.rowcount:
+            logger.info(f"[cache] Dropped {stale.rowcount} entries from an older index")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT id, filter_key, vector FROM bundles WHERE version = ? ORDER BY id",
+            (self.version,),
+        ).fetchall()
+        self._ids = [row[0] for row in rows]
+        self._filters = [row[1] for row in rows]
+        self._vectors = (
+            self._np.stack([self._np.frombuffer(row[2], dtype="float32") for row in rows])
+            if rows
+            else None
+        )
+
+    def _unit(self, vector):
+        vector = self._np.asarray(vector, dtype="float32")
+        return vector / (self._np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, vector, filter_key=""):
+        with self._lock:
+            if self._vectors is None:
+                self.stats.misses += 1
+                return None
+            scores = self._vectors @ self._unit(vector)
+            for row in self._np.argsort(-scores):
+                if scores[row] < self.threshold:
+                    break
+                if self._filters[row] == filter_key:
+                    bundle, cost = self._conn.execute(
+                        "SELECT bundle, cost FROM bundles WHERE id = ?", (self._ids[row],)
+                    ).fetchone()
+                    self.stats.hits += 1
+                    self.stats.saved_seconds += cost
+                    return json.loads(bundle)
+            self.stats.misses += 1
+            return None
+
+    def store(self, vector, bundle, filter_key="", cost=0.0):
+        vector = self._unit(vector)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO bundles (version, filter_key, vector, bundle, cost, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.version,
+                    filter_key,
+                    vector.tobytes(),
+                    json.dumps(bundle, ensure_ascii=False),
+                    cost,
+                    time.time(),
+                ),
+            )
+            self._ids.append(cursor.lastrowid)
+            self._filters.append(filter_key)
+            self._vectors = (
+                vector[None, :]
+                if self._vectors is None
+                else self._np.vstack([self._vectors, vector])
+            )
+            overflow = len(self._ids) - self.maxsize
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM bundles WHERE id IN "
+                    "(SELECT id FROM bundles WHERE version = ? ORDER BY id LIMIT ?)",
+                    (self.version, overflow),
+                )
+                self.stats.evictions += overflow
+                self._load()
+            self._conn.commit()
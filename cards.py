@@ -0,0 +1,149 @@
+import os
+import re
+
+from catalog import iter_projects, price_range_cr, project_id
+
+# Compact per-project "cards" precomputed from mumbaidata.json. Retrieved
+# chunks are mapped to project ids and each project goes into the prompt once,
+# as its card, instead of the full chunk text; images come from the cards,
+# ranked and capped, instead of walking every chunk's metadata each turn.
+
+CARD_AMENITIES = int(os.getenv("CARD_AMENITIES", "8"))
+IMAGES_PER_PROJECT = int(os.getenv("IMAGES_PER_PROJECT", "2"))
+PROMPT_MAX_IMAGES = int(os.getenv("PROMPT_MAX_IMAGES", "6"))
+
+# Image labels in the order they are offered to the model.
+IMAGE_LABELS = ("exterior", "interior", "amenity")
+
+_SENTENCE = re.compile(r"(.+?[.!?])(\s|$)", re.S)
+
+
+def _price(low, high):
+    if low is None and high is None:
+        return "price on request"
+    if high is None or high == low:
+        return f"from ₹{low:g} Cr"
+    if low is None:
+        return f"up to ₹{high:g} Cr"
+    return f"₹{low:g} Cr to ₹{high:g} Cr"
+
+
+def _first_sentence(text):
+    match = _SENTENCE.match(text or "")
+    return match.group(1) if match else (text or "")
+
+
+def _units(project):
+    parts = []
+    for unit in project.get("unit_configurations") or []:
+        size = f" {unit['size_sqft']} sqft" if unit.get("size_sqft") else ""
+        parts.append(f"{unit.get('type')}{size}")
+    return "; ".join(parts)
+
+
+def rank_images(images):
+    """``(label, url)`` pairs, best label first, without duplicates."""
+    order = {label: i for i, label in enumerate(IMAGE_LABELS)}
+    ranked = []
+    seen = set()
+    for label in sorted(images or {}, key=lambda label: order.get(label, len(order))):
+        urls = images[label]
+        for url in urls if isinstance(urls, list) else [urls]:
+            url = (url or "").strip()
+            if url and url not in seen:
+                seen.add(url)
+                ranked.append((label, url))
+    return tuple(ranked)
+
+
+def card_text(locality, project):
+    location = project.get("location") or {}
+    dates = project.get("key_dates") or {}
+    sales = project.get("sales_agent_metadata") or {}
+    amenities = project.get("amenities") or []
+    more = f" (+{len(amenities) - CARD_AMENITIES} more)" if len(amenities) > CARD_AMENITIES else ""
+    advantages = "; ".join(v for v in (project.get("location_advantages") or {}).values() if v)
+    lines = [
+        f"Project: {project['project_name']} by {project.get('developer')}",
+        f"Where: {locality['name']}, {location.get('address')}",
+        f"Type: {project.get('property_type')}, {project.get('status')}",
+        f"Price: {_price(*price_range_cr(project))}",
+        f"Units: {_units(project) or 'on request'}",
+        f"About: {_first_sentence(project.get('description'))}",
+        f"Highlights: {', '.join(project.get('sales_tags') or [])}",
+        f"Amenities: {', '.join(amenities[:CARD_AMENITIES])}{more}",
+        f"Location: {advantages}",
+        f"Booking: {sales.get('booking_status')}; completion {dates.get('completion_date')}; "
+        f"payment plan: {project.get('payment_plan')}",
+        f"Scores: desirability {(project.get('desirability') or {}).get('score')}, "
+        f"investment {(project.get('investment_grade') or {}).get('score')}",
+    ]
+    return "\n".join(line for line in lines if not line.endswith(": "))
+
+
+class ProjectCard:
+    __slots__ = ("project_id", "name", "locality", "text", "price_min", "price_max", "images")
+
+    def __init__(self, locality, project):
+        self.project_id = project_id(locality, project)
+        self.name = project["project_name"]
+        self.locality = locality["name"]
+        self.text = card_text(locality, project)
+        self.price_min, self.price_max = price_range_cr(project)
+        self.images = rank_images(project.get("images"))
+
+
+class CardStore:
+    """Project cards keyed by project id, built once when the index is loaded."""
+
+    def __init__(self):
+        self.cards = {}
+        self._ids_by_name = {}
+
+    def __len__(self):
+        return len(self.cards)
+
+    def add(self, card):
+        self.cards[card.project_id] = card
+        self._ids_by_name[card.name] = card.project_id
+
+    @classmethod
+    def from_catalog(cls, data):
+        store = cls()
+        for locality, project in iter_projects(data):
+            store.add(ProjectCard(locality, project))
+        return store
+
+    def project_id(self, doc):
+        """The project id a retrieved chunk belongs to, or ``None``."""
+        metadata = doc.metadata
+        if metadata.get("type") != "project":
+            return None
+        pid = metadata.get("project_id") or self._ids_by_name.get(metadata.get("project_name"))
+        return pid if pid in self.cards else None
+
+    def context(self, docs, per_project=IMAGES_PER_PROJECT, max_images=PROMPT_MAX_IMAGES):
+        """Prompt chunks and image lines for ``docs``, in their rank order.
+
+        Each project contributes its card once however many of its chunks were
+        retrieved. Other chunks (locality overviews, projects without a card)
+        are kept as they are, once each. Images come from the highest-ranked
+        projects first, ``per_project`` each and ``max_images`` in all.
+        """
+        chunks, images = [], []
+        seen = set()
+        for doc in docs:
+            pid = self.project_id(doc)
+            key = pid or doc.page_content
+            if key in seen:
+                continue
+            seen.add(key)
+            if pid is None:
+                chunks.append(doc.page_content)
+                continue
+            card = self.cards[pid]
+            chunks.append(card.text)
+            for label, url in card.images[:per_project]:
+                if len(images) < max_images:
+                    images.append(f"- {card.name} ({label}): {url}")
+        return chunks, images
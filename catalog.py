@@ -0,0 +1,206 @@
+import json
+import os
+import re
+
+# Reading and chunking the city data file (mumbaidata.json). Shared by the
+# ingestion command and by anything that needs structured project fields at
+# runtime.
+
+BASE_DIR = os.getcwd()
+DATA_PATH = os.path.join(BASE_DIR, "mumbaidata.json")
+
+_BHK = re.compile(r"(\d+(?:\.\d+)?)(?:\s*[/–-]\s*(\d+(?:\.\d+)?))?\s*BHK", re.IGNORECASE)
+
+
+def load_catalog(path=DATA_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_localities(data):
+    """Yield locality dicts, flattening nested groups of localities."""
+    stack = list(reversed(data.get("localities", [])))
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+        elif isinstance(item, dict) and item.get("name"):
+            yield item
+
+
+def iter_projects(data):
+    """Yield ``(locality, project)`` pairs in file order."""
+    for locality in iter_localities(data):
+        development = locality.get("DevelopmentActivity") or {}
+        for project in development.get("projects") or []:
+            yield locality, project
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def project_id(locality, project):
+    return f"{slugify(locality['name'])}/{slugify(project['project_name'])}"
+
+
+def price_range_cr(project):
+    """Return ``(min, max)`` price in crore across all pricing bands."""
+    lows, highs = [], []
+    for band in (project.get("pricing") or {}).values():
+        if not isinstance(band, dict):
+            continue
+        if band.get("min") is not None:
+            lows.append(band["min"])
+        if band.get("max") is not None:
+            highs.append(band["max"])
+    for unit in project.get("unit_configurations") or []:
+        if unit.get("starting_price_inr_cr") is not None:
+            lows.append(unit["starting_price_inr_cr"])
+    low = min(lows) if lows else None
+    high = max(highs) if highs else None
+    if high is not None and low is not None and high < low:
+        high = low
+    return low, high
+
+
+def bhk_options(project):
+    """Bedroom counts offered, e.g. ``[3, 4, 5]`` for "3 BHK" and "4/5 BHK Duplex"."""
+    options = set()
+    for unit in project.get("unit_configurations") or []:
+        for match in _BHK.finditer(unit.get("type") or ""):
+            low = float(match.group(1))
+            high = float(match.group(2) or low)
+            options.update(range(int(low), int(high) + 1))
+    return sorted(options)
+
+
+def _pairs(items):
+    return "; ".join(f"{i['name']} ({i['distance_km']} km)" for i in items or [])
+
+
+def locality_text(locality):
+    pricing = locality.get("PricingAndMarketTrends") or {}
+    connectivity = locality.get("ConnectivityAndInfrastructure") or {}
+    demographics = locality.get("DemographicsAndLifestyle") or {}
+    sentiment = locality.get("SentimentAndPerception") or {}
+    railway = connectivity.get("nearest_railway_station") or {}
+    airport = connectivity.get("nearest_airport") or {}
+    return f"""Locality: {locality['name']}
+
+🏙️ Pricing & Trends:
+- Apartment Rate: ₹{pricing.get('apartment_avg_rate_per_sqft')}/sqft
+- Rental Yield: {pricing.get('apartment_rental_yield_percent')}%
+- Past 4yr Appreciation: {pricing.get('appreciation_last_4yrs_percent')}%
+- Future 3yr Projection: {pricing.get('projected_appreciation_next_3yrs_percent')}%
+- Demand-Supply: {pricing.get('supply_demand_ratio')}
+
+🛣️ Connectivity:
+- Nearest Railway: {railway.get('name')} ({railway.get('distance_km')} km)
+- Nearest Airport: {airport.get('name')} ({airport.get('distance_km')} km)
+- Roads: {_pairs(connectivity.get('major_roads_highways'))}
+- Hospitals: {_pairs(connectivity.get('top_hospitals'))}
+- Schools/Colleges: {_pairs(connectivity.get('top_schools_colleges'))}
+- Infra Projects: {'; '.join(connectivity.get('ongoing_planned_infra_projects') or [])}
+
+👥 Demographics:
+- Population Density: {demographics.get('population_density_per_sqkm')}/sq.km
+- Avg Income: {demographics.get('average_household_income')}
+- Dominant Professions: {', '.join(demographics.get('dominant_professions') or [])}
+- Liveability Index: {demographics.get('liveability_index')}
+- Safety Index: {demographics.get('safety_index')}
+- Nearby Attractions: {', '.join(demographics.get('nearby_attractions') or [])}
+
+📊 Public Sentiment:
+- Sentiment Score: {sentiment.get('sentiment_score')}
+- Themes: {', '.join(sentiment.get('common_sentiment_themes') or [])}
+
+✨ Local USPs:
+- {', '.join(locality.get('LocalInsights_USPs') or [])}"""
+
+
+def _format_cr(value):
+    return f"₹{value:g} Cr" if value is not None else "price on request"
+
+
+def project_text(locality, project):
+    location = project.get("location") or {}
+    dates = project.get("key_dates") or {}
+    sales = project.get("sales_agent_metadata") or {}
+    low, high = price_range_cr(project)
+    units = []
+    for unit in project.get("unit_configurations") or []:
+        size = f"{unit['size_sqft']} sqft" if unit.get("size_sqft") else "size on request"
+        units.append(
+            f"- {unit.get('type')}: {size}, {_format_cr(unit.get('starting_price_inr_cr'))}"
+        )
+    advantages = [
+        f"- {key.replace('_', ' ').title()}: {value}"
+        for key, value in (project.get("location_advantages") or {}).items()
+        if value
+    ]
+    return f"""Project: {project['project_name']}
+Developer: {project.get('developer')}
+Location: {locality['name']}, {location.get('address')}
+Description: {project.get('description')}
+Property Type: {project.get('property_type')}
+Status: {project.get('status')}
+Price Range: {_format_cr(low)} to {_format_cr(high)}
+Unit Types:
+{chr(10).join(units)}
+Amenities: {', '.join(project.get('amenities') or [])}
+Services: {', '.join(project.get('services') or [])}
+Certifications: {', '.join(project.get('certifications') or [])}
+Sales Tags: {', '.join(project.get('sales_tags') or [])}
+Booking Status: {sales.get('booking_status')}
+Payment Plan: {project.get('payment_plan')}
+Launch Date: {dates.get('launch_date')}
+Completion Date: {dates.get('completion_date')}
+Location Advantages:
+{chr(10).join(advantages)}
+Scores:
+- Desirability Score: {(project.get('desirability') or {}).get('score')}
+- Investment Grade: {(project.get('investment_grade') or {}).get('score')}
+- Final Score: {project.get('final_score')}"""
+
+
+def project_metadata(locality, project):
+    location = project.get("location") or {}
+    low, high = price_range_cr(project)
+    return {
+        "type": "project",
+        "project_id": project_id(locality, project),
+        "project_name": project["project_name"],
+        "developer": project.get("developer"),
+        "area": locality["name"],
+        "address": location.get("address"),
+        "map_url": location.get("google_maps_url"),
+        "status": project.get("status"),
+        "images": project.get("images") or {},
+        "price_min_cr": low,
+        "price_max_cr": high,
+        "bhk": bhk_options(project),
+        "desirability": (project.get("desirability") or {}).get("score"),
+        "investment_grade": (project.get("investment_grade") or {}).get("score"),
+    }
+
+
+def build_chunks(data):
+    """Return ``(key, text, metadata)`` for every chunk, in a stable order.
+
+    Each locality contributes one overview chunk followed by one chunk per
+    project, matching the layout the vector store was originally built with.
+    """
+    chunks = []
+    for locality in iter_localities(data):
+        key = f"locality/{slugify(locality['name'])}"
+        chunks.append(
+            (key, locality_text(locality), {"type": "locality", "locality_name": locality["name"]})
+        )
+        development = locality.get("DevelopmentActivity") or {}
+        for project in development.get("projects") or []:
+            metadata = project_metadata(locality, project)
+            chunks.append(
+                (f"project/{metadata['project_id']}", project_text(locality, project), metadata)
+            )
+    return chunks
@@ -0,0 +1,148 @@
+"""Pickle-free, memory-mapped storage for the vector store's documents.
+
+``docstore.jsonl`` holds one line per FAISS row, in row order::
+
+    <docstore id>\\t{"page_content": ..., "metadata": {...}}
+
+Loading only scans line offsets; a document is decoded when it is looked up.
+The file is plain JSON, so loading it cannot execute code the way unpickling
+``index.pkl`` can.
+
+    python docstore.py migrate mumbai_vector_db   # convert a legacy index.pkl
+"""
+
+import json
+import mmap
+import os
+import pickle
+import sys
+
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_FILE = "docstore.jsonl"
+INDEX_FILE = "index.faiss"
+
+
+class MappedDocstore(Docstore):
+    """Read-only docstore backed by a memory-mapped ``docstore.jsonl``."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = {}
+        self.index_to_docstore_id = {}
+        start = 0
+        while start < len(self._map):
+            end = self._map.find(b"\n", start)
+            end = len(self._map) if end == -1 else end
+            tab = self._map.find(b"\t", start, end)
+            doc_id = self._map[start:tab].decode("utf-8")
+            self.index_to_docstore_id[len(self._offsets)] = doc_id
+            self._offsets[doc_id] = (tab + 1, end)
+            start = end + 1
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def search(self, search):
+        span = self._offsets.get(search)
+        if span is None:
+            return f"ID {search} not found."
+        record = json.loads(self._map[span[0] : span[1]])
+        return Document(id=search, **record)
+
+    def add(self, texts):
+        raise NotImplementedError("MappedDocstore is read-only; rebuild with ingest.py")
+
+    def delete(self, ids):
+        raise NotImplementedError("MappedDocstore is read-only; rebuild with ingest.py")
+
+
+def write_docstore(path, index_to_docstore_id, docstore):
+    """Write the documents of a LangChain FAISS store in FAISS row order."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for row in range(len(index_to_docstore_id)):
+            doc_id = index_to_docstore_id[row]
+            doc = docstore.search(doc_id)
+            record = {"page_content": doc.page_content, "metadata": doc.metadata}
+            f.write(f"{doc_id}\t{json.dumps(record, ensure_ascii=False)}\n")
+    os.replace(tmp_path, path)
+
+
+def save_vector_store(store, index_dir):
+    import faiss
+
+    os.makedirs(index_dir, exist_ok=True)
+    faiss.write_index(store.index, os.path.join(index_dir, INDEX_FILE))
+    write_docstore(
+        os.path.join(index_dir, DOCSTORE_FILE), store.index_to_docstore_id, store.docstore
+    )
+
+
+def load_vector_store(index_dir, embedding):
+    """Open a saved index without unpickling, memory-mapping the FAISS file."""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    path = os.path.join(index_dir, INDEX_FILE)
+    try:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Index types without mmap support are read into memory instead.
+        index = faiss.read_index(path)
+    docstore = MappedDocstore(os.path.join(index_dir, DOCSTORE_FILE))
+    return FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=docstore.index_to_docstore_id,
+    )
+
+
+class _PickledState:
+    def __setstate__(self, state):
+        # Pydantic models pickle as {"__dict__": fields, ...}.
+        self.state = state.get("__dict__", state) if isinstance(state, dict) else {}
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Reads ``index.pkl`` without importing or running anything but plain state."""
+
+    ALLOWED = {
+        ("langchain_community.docstore.in_memory", "InMemoryDocstore"),
+        ("langchain_core.documents.base", "Document"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from index.pkl")
+        return type(name, (_PickledState,), {})
+
+
+class _LegacyDocstore:
+    def __init__(self, pickled):
+        self._docs = pickled.state["_dict"]
+
+    def search(self, doc_id):
+        return Document(**{k: self._docs[doc_id].state[k] for k in ("page_content", "metadata")})
+
+
+def migrate(index_dir):
+    """Convert a legacy ``index.pkl`` into ``docstore.jsonl``."""
+    pkl_path = os.path.join(index_dir, "index.pkl")
+    with open(pkl_path, "rb") as f:
+        docstore, index_to_docstore_id = _LegacyUnpickler(f).load()
+    write_docstore(
+        os.path.join(index_dir, DOCSTORE_FILE), index_to_docstore_id, _LegacyDocstore(docstore)
+    )
+    os.remove(pkl_path)
+    print(f"Wrote {len(index_to_docstore_id)} documents to {DOCSTORE_FILE}, removed index.pkl")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "migrate":
+        sys.exit(__doc__)
+    migrate(sys.argv[2])
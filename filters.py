@@ -0,0 +1,253 @@
+import math
+import re
+from array import array
+
+from catalog import iter_localities, iter_projects, bhk_options, price_range_cr
+
+# Structured pre-filtering of projects before vector search. The caller's
+# budget, BHK and locality are tracked across a session as "slots"; a small
+# column store over the indexed projects turns those slots into the FAISS ids
+# that may be searched.
+
+BUDGET_TOLERANCE = 0.1
+
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20, "fifty": 50,
+    "ek": 1, "do": 2, "teen": 3, "char": 4, "chaar": 4, "paanch": 5, "panch": 5,
+    "chhe": 6, "che": 6, "saat": 7, "aath": 8, "nau": 9, "das": 10, "pachas": 50,
+    "एक": 1, "दो": 2, "तीन": 3, "चार": 4, "पाँच": 5, "पांच": 5, "छह": 6, "सात": 7,
+    "आठ": 8, "नौ": 9, "दस": 10,
+}
+_NUM = r"\b(\d+(?:\.\d+)?|" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r")"
+_CRORE = r"(?:crores?|cr|करोड़|करोड|karod|karor)"
+_LAKH = r"(?:lakhs?|lacs?|लाख)"
+_UNIT = rf"({_CRORE}|{_LAKH})"
+
+_RANGE = re.compile(rf"{_NUM}\s*(?:{_UNIT}\s*)?(?:to|-|–|se|और|and)\s*{_NUM}\s*{_UNIT}", re.I)
+_AMOUNT = re.compile(rf"{_NUM}\s*{_UNIT}", re.I)
+_LOWER = re.compile(r"(above|over|more than|minimum|at least|se zyada|se upar|से ज़्यादा|से ऊपर)", re.I)
+_BHK = re.compile(rf"{_NUM}\s*(?:bhk|bedrooms?|beds?|बीएचके)", re.I)
+
+# Spoken and Devanagari spellings of the localities in the catalog.
+LOCALITY_ALIASES = {
+    "वर्ली": "Worli",
+    "पवई": "Powai",
+    "अंधेरी": "Andheri West",
+    "andheri": "Andheri West",
+    "लोअर परेल": "Lower Parel",
+    "बांद्रा": "Bandra West",
+    "bandra": "Bandra West",
+    "चेंबूर": "Chembur",
+    "मलाड": "Malad West",
+    "malad": "Malad West",
+    "घाटकोपर": "Ghatkopar",
+    "सांताक्रूज़": "Santacruz West",
+    "santacruz": "Santacruz West",
+    "मुलुंड": "Mulund",
+}
+
+_SIDES = {
+    "east": "East", "west": "West", "ईस्ट": "East", "वेस्ट": "West",
+    "पूर्व": "East", "पश्चिम": "West",
+}
+_SIDE = re.compile(r"\s*(" + "|".join(_SIDES) + r")\b")
+
+
+def _number(token):
+    return float(_NUMBER_WORDS.get(token.lower(), token))
+
+
+def _to_crore(value, unit):
+    return value / 100 if re.fullmatch(_LAKH, unit, re.I) else value
+
+
+def extract_slots(text, slots=None, localities=()):
+    """Update ``slots`` with budget, BHK and locality mentioned in ``text``.
+
+    Slots persist across turns: a new mention overwrites the old value, and
+    anything not mentioned is left as it was. Keys are ``budget_min_cr``,
+    ``budget_max_cr``, ``bhk`` and ``locality``.
+    """
+    slots = {} if slots is None else slots
+    lowered = text.lower()
+
+    match = _RANGE.search(text)
+    if match:
+        low = _to_crore(_number(match.group(1)), match.group(2) or match.group(4))
+        high = _to_crore(_number(match.group(3)), match.group(4))
+        slots["budget_min_cr"], slots["budget_max_cr"] = min(low, high), max(low, high)
+    else:
+        match = _AMOUNT.search(text)
+        if match:
+            amount = _to_crore(_number(match.group(1)), match.group(2))
+            if _LOWER.search(text):
+                slots["budget_min_cr"] = amount
+                slots.pop("budget_max_cr", None)
+            else:
+                # "under 5 crore" and a bare "my budget is 5 crore" both cap it.
+                slots["budget_max_cr"] = amount
+                slots.pop("budget_min_cr", None)
+
+    match = _BHK.search(text)
+    if match:
+        slots["bhk"] = int(_number(match.group(1)))
+
+    # The last locality mentioned wins ("not Worli, show me Powai"), and the
+    # longest name at that position ("Santacruz East" over "santacruz").
+    names = {name.lower(): name for name in localities}
+    names.update(LOCALITY_ALIASES)
+    best = None
+    for alias, name in names.items():
+        if name not in localities:
+            continue
+        for match in re.finditer(re.escape(alias), lowered):
+            side = _SIDE.match(lowered, match.end())
+            # A bare "andheri" means Andheri West, but "andheri east" does not.
+            if side and _SIDES[side.group(1)] not in name:
+                continue
+            if best is None or (match.start(), len(alias)) > best[:2]:
+                best = (match.start(), len(alias), name)
+    if best:
+        slots["locality"] = best[2]
+
+    return slots
+
+
+def describe_slots(slots):
+    parts = []
+    if "budget_min_cr" in slots and "budget_max_cr" in slots:
+        parts.append(f"budget ₹{slots['budget_min_cr']:g}–{slots['budget_max_cr']:g} Cr")
+    elif "budget_max_cr" in slots:
+        parts.append(f"budget up to ₹{slots['budget_max_cr']:g} Cr")
+    elif "budget_min_cr" in slots:
+        parts.append(f"budget from ₹{slots['budget_min_cr']:g} Cr")
+    if "bhk" in slots:
+        parts.append(f"{slots['bhk']} BHK")
+    if "locality" in slots:
+        parts.append(slots["locality"])
+    return ", ".join(parts)
+
+
+class ProjectIndex:
+    """Column store of filterable fields for every document in the vector store.
+
+    One row per FAISS id. Prices are ``nan`` and the BHK mask is 0 when the
+    data does not say, and such rows are never filtered out on that field.
+    """
+
+    def __init__(self):
+        self.faiss_ids = array("q")
+        self.is_project = array("b")
+        self.locality = array("h")
+        self.price_min = array("d")
+        self.price_max = array("d")
+        self.bhk_mask = array("L")
+        self.localities = []
+        self._project_ids = set()
+
+    def __len__(self):
+        return len(self.faiss_ids)
+
+    def _locality_code(self, name):
+        if name not in self.localities:
+            self.localities.append(name)
+        return self.localities.index(name)
+
+    def add(self, faiss_id, locality, project=None):
+        low, high = price_range_cr(project) if project else (None, None)
+        mask = 0
+        for bhk in bhk_options(project) if project else []:
+            mask |= 1 << bhk
+        self.faiss_ids.append(faiss_id)
+        self.is_project.append(1 if project else 0)
+        self.locality.append(self._locality_code(locality))
+        self.price_min.append(math.nan if low is None else low)
+        self.price_max.append(math.nan if high is None else high)
+        self.bhk_mask.append(mask)
+        if project:
+            self._project_ids.add(faiss_id)
+
+    @classmethod
+    def from_vector_store(cls, store, data):
+        """Index ``store``'s documents, joining project chunks to ``data`` by name."""
+        projects = {project["project_name"]: (locality, project) for locality, project in iter_projects(data)}
+        index = cls()
+        for locality in iter_localities(data):
+            index._locality_code(locality["name"])
+        for faiss_id, doc_id in store.index_to_docstore_id.items():
+            metadata = store.docstore.search(doc_id).metadata
+            if metadata.get("type") == "project" and metadata.get("project_name") in projects:
+                locality, project = projects[metadata["project_name"]]
+                index.add(faiss_id, locality["name"], project)
+            elif metadata.get("type") == "locality":
+                index.add(faiss_id, metadata.get("locality_name"))
+        return index
+
+    def select(self, slots):
+        """FAISS ids eligible under ``slots``, or ``None`` when nothing is set.
+
+        Locality overviews stay searchable (only the selected locality's when
+        one is set) so the agent can still talk about the area when no
+        project fits.
+        """
+        budget_min = slots.get("budget_min_cr")
+        budget_max = slots.get("budget_max_cr")
+        bhk_bit = 1 << slots["bhk"] if "bhk" in slots else 0
+        locality = slots.get("locality")
+        if budget_min is None and budget_max is None and not bhk_bit and locality is None:
+            return None
+        locality_code = self.localities.index(locality) if locality in self.localities else -1
+
+        selected = []
+        for row in range(len(self.faiss_ids)):
+            if locality is not None and self.locality[row] != locality_code:
+                continue
+            if self.is_project[row]:
+                low, high = self.price_min[row], self.price_max[row]
+                if budget_max is not None and low > budget_max * (1 + BUDGET_TOLERANCE):
+                    continue
+                if budget_min is not None and high < budget_min:
+                    continue
+                if bhk_bit and self.bhk_mask[row] and not self.bhk_mask[row] & bhk_bit:
+                    continue
+            selected.append(self.faiss_ids[row])
+        return selected
+
+    def select_relaxed(self, slots):
+        """``select``, widened when no project fits ``slots``.
+
+        The locality is dropped first, then every filter. Returns ``(ids,
+        relaxed)`` where ``relaxed`` lists the slot keys that were ignored;
+        ``ids`` is ``None`` when the search is unfiltered.
+        """
+        attempts = [slots]
+        if "locality" in slots:
+            attempts.append({key: value for key, value in slots.items() if key != "locality"})
+        for attempt in attempts:
+            ids = self.select(attempt)
+            if ids is None or not self._project_ids.isdisjoint(ids):
+                return ids, [key for key in slots if key not in attempt]
+        return None, list(slots)
+
+
+def filtered_search(store, query_vector, ids, k):
+    """Top-``k`` documents among FAISS ``ids`` for ``query_vector``."""
+    import faiss
+    import numpy as np
+
+    if not ids:
+        return []
+    query = np.array([query_vector], dtype="float32")
+    selector = faiss.IDSelectorBatch(np.array(ids, dtype="int64"))
+    try:
+        _, found = store.index.search(
+            query, min(k, len(ids)), params=faiss.SearchParameters(sel=selector)
+        )
+        found = [i for i in found[0] if i != -1]
+    except (TypeError, RuntimeError):
+        # Index types without selector support: rank everything, keep allowed.
+        allowed = set(ids)
+        _, found = store.index.search(query, store.index.ntotal)
+        found = [i for i in found[0] if i in allowed][:k]
+    return [store.docstore.search(store.index_to_docstore_id[i]) for i in found]
@@ -0,0 +1,200 @@
+"""Build the FAISS index in mumbai_vector_db from mumbaidata.json.
+
+    python ingest.py                     # rebuild, embedding only changed chunks
+    python ingest.py --dry-run           # show what would be embedded
+
+Chunks are produced deterministically by ``catalog.build_chunks``. Embeddings
+are cached by a hash of the embedding model and chunk text, so editing one
+project only re-embeds that project. The new index is written to a temporary
+directory next to the target and renamed into place; the old index is moved
+back if that rename fails. Documents are stored as
+``docstore.jsonl`` rather than a pickle (see ``docstore.py``). The model goes
+into ``manifest.json`` and the bot embeds queries with it (``index_model``),
+so an index built with ``--model`` is queried with the same model. A running
+process keeps the index it loaded until ``bot.reload_index()`` is called.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import stat
+import tempfile
+import uuid
+from array import array
+
+from dotenv import load_dotenv
+
+from catalog import BASE_DIR, DATA_PATH, build_chunks, load_catalog
+
+logger = logging.getLogger("ingest")
+
+INDEX_DIR = os.path.join(BASE_DIR, "mumbai_vector_db")
+CACHE_PATH = os.path.join(BASE_DIR, ".embedding_cache.sqlite")
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+
+def index_model(index_dir=INDEX_DIR):
+    """The embedding model ``index_dir`` was built with, from its manifest.
+
+    Indexes written before the manifest existed were built with the default.
+    """
+    try:
+        with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f).get("model") or EMBEDDING_MODEL
+    except FileNotFoundError:
+        return EMBEDDING_MODEL
+
+
+def content_hash(text, model=EMBEDDING_MODEL):
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed store of embedding vectors in a local SQLite file."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB)"
+        )
+
+    def get_many(self, hashes):
+        found = {}
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start : start + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+            [(key, array("f", vector).tobytes()) for key, vector in items],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def embed_texts(texts, embedder, cache, model=EMBEDDING_MODEL, batch_size=64):
+    """Return one vector per text, calling ``embedder`` only for cache misses."""
+    hashes = [content_hash(text, model) for text in texts]
+    cached = cache.get_many(sorted(set(hashes)))
+    missing = {}
+    for key, text in zip(hashes, texts):
+        if key not in cached:
+            missing.setdefault(key, text)
+
+    pending = list(missing.items())
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start : start + batch_size]
+        vectors = embedder.embed_documents([text for _, text in batch])
+        cache.put_many(zip([key for key, _ in batch], vectors))
+        cached.update(zip([key for key, _ in batch], vectors))
+        logger.info(f"Embedded {start + len(batch)}/{len(pending)} changed chunks")
+
+    return [cached[key] for key in hashes], len(pending)
+
+
+def write_index(chunks, vectors, embedder, out_dir=INDEX_DIR, model=EMBEDDING_MODEL):
+    from langchain_community.vectorstores import FAISS
+
+    from docstore import save_vector_store
+
+    store = FAISS.from_embeddings(
+        text_embeddings=[(text, vector) for (_, text, _), vector in zip(chunks, vectors)],
+        embedding=embedder,
+        metadatas=[metadata for _, _, metadata in chunks],
+        ids=[str(uuid.uuid5(uuid.NAMESPACE_URL, key)) for key, _, _ in chunks],
+    )
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    tmp_dir = tempfile.mkdtemp(prefix=".ingest-", dir=parent)
+    try:
+        save_vector_store(store, tmp_dir)
+        manifest = {
+            "model": model,
+            "chunks": {key: content_hash(text, model) for key, text, _ in chunks},
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        # mkdtemp creates the directory 0700; give it the old index's mode, or
+        # the umask default, so the worker can still read it.
+        if os.path.exists(out_dir):
+            mode = stat.S_IMODE(os.stat(out_dir).st_mode)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o777 & ~umask
+        os.chmod(tmp_dir, mode)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Two renames: the old index is moved aside, then the new one into place.
+    # If the second fails the old index is moved back.
+    old_dir = None
+    if os.path.exists(out_dir):
+        old_dir = f"{out_dir}.old-{os.getpid()}"
+        os.rename(out_dir, old_dir)
+    try:
+        os.rename(tmp_dir, out_dir)
+    except BaseException:
+        if old_dir:
+            os.rename(old_dir, out_dir)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--out", default=INDEX_DIR)
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    chunks = build_chunks(load_catalog(args.data))
+    cache = EmbeddingCache(args.cache)
+    try:
+        if args.dry_run:
+            hashes = [content_hash(text, args.model) for _, text, _ in chunks]
+            cached = cache.get_many(hashes)
+            for (key, _, _), digest in zip(chunks, hashes):
+                print(f"{'cached ' if digest in cached else 'embed  '} {key}")
+            return
+
+        from langchain_openai import OpenAIEmbeddings
+
+        embedder = OpenAIEmbeddings(model=args.model)
+        vectors, embedded = embed_texts(
+            [text for _, text, _ in chunks], embedder, cache, args.model, args.batch_size
+        )
+        write_index(chunks, vectors, embedder, args.out, args.model)
+        logger.info(
+            f"Wrote {len(chunks)} chunks to {args.out} "
+            f"({embedded} embedded, {len(chunks) - embedded} from cache)"
+        )
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import math
+import re
+from collections import Counter
+
+# Local language identification for caller utterances. Script alone settles
+# Devanagari and Tamil text; romanised text is scored against small character
+# trigram profiles for English, Hinglish and Tanglish.
+
+SUPPORTED = ("en", "hi", "ta")
+
+# Hinglish is answered in "hi" (the prompt mixes Hindi and English for it) and
+# romanised Tamil is answered in Tamil.
+CODES = {"en": "en", "hi": "hi", "hinglish": "hi", "ta": "ta", "tanglish": "ta"}
+
+_SEED = {
+    "en": """
+        hello i am looking for a luxury apartment in mumbai what is the price
+        of a three bedroom flat near the sea can you tell me about the
+        amenities and the location is it ready to move or under construction
+        which projects are available in my budget of five crore how far is
+        the airport from here i would like to schedule a site visit please
+        thank you that sounds good what about schools and hospitals nearby
+        show me some pictures of the building does it have a swimming pool
+    """,
+    "hinglish": """
+        mujhe worli mein ek flat chahiye kya aap bata sakte hain price kitna
+        hai mera budget paanch crore hai teen bhk ka rate kya hai yeh project
+        kab tak ready hoga mujhe sea view wala ghar chahiye aur kya options
+        hain powai mein acha theek hai aur batao amenities kya kya hain
+        school aur hospital paas mein hai kya main site visit karna chahta
+        hoon humko bada ghar chahiye family ke liye kitne din mein possession
+        milega nahi yeh bahut mehenga hai koi sasta option dikhao
+    """,
+    "tanglish": """
+        vanakkam enakku mumbai la oru flat venum price evlo irukku naan
+        worli la veedu paakanum enna amenities irukku sollunga romba nalla
+        irukku budget anju crore thaan ungalukku theriyuma idhu ready ah
+        illa innum kattitu irukaangala school hospital pakkathula irukka
+        enga family ku periya veedu venum konjam photos anuppunga nandri
+    """,
+}
+
+_MARKERS = {
+    "en": set(
+        """the a an is are was what which who how where when does do can
+        could would will i you me my your we our for of to and with about
+        this that there have has from near please thank""".split()
+    ),
+    "hinglish": set(
+        """hai hain kya mujhe mera meri mere aap aapka hum humko chahiye
+        chahta chahti kitna kitne kitni batao bataiye bata mein nahi nahin
+        acha accha theek thik aur bhi kab kaise kahan kaun yeh woh wala wali
+        ghar sasta mehenga dikhao dikhaiye karna karo hoga hogi milega liye
+        ka ki ke ko se par tha thi raha rahi haan ji bilkul sahi zaroor
+        matlab lekin toh abhi kuch sab thoda jaldi yahan wahan kyun agar
+        phir pehle baad""".split()
+    ),
+    "tanglish": set(
+        """vanakkam enakku venum evlo irukku irukka sollunga romba nalla
+        illa illai enna enga naan ungal ungalukku thaan konjam anuppunga
+        nandri veedu paakanum theriyuma pakkathula periya seri sari aama
+        paravala venaam vendam podhum epdi eppo ippo inga anga adhu idhu
+        pannunga paarunga kudunga""".split()
+    ),
+}
+
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def _trigrams(text):
+    grams = Counter()
+    for word in _WORD.findall(text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            grams[padded[i : i + 3]] += 1
+    return grams
+
+
+def _profile(text):
+    grams = _trigrams(text)
+    total = sum(grams.values())
+    vocab = len(grams) + 1
+    return {g: math.log((c + 1) / (total + vocab)) for g, c in grams.items()}, math.log(
+        1 / (total + vocab)
+    )
+
+
+_PROFILES = {label: _profile(text) for label, text in _SEED.items()}
+
+
+def script_of(text):
+    """Return the dominant script of ``text``: latin, devanagari, tamil or None."""
+    counts = Counter()
+    for char in text:
+        code = ord(char)
+        if 0x0900 <= code <= 0x097F:
+            counts["devanagari"] += 1
+        elif 0x0B80 <= code <= 0x0BFF:
+            counts["tamil"] += 1
+        elif char.isalpha() and code < 0x0250:
+            counts["latin"] += 1
+    if not counts:
+        return None
+    return counts.most_common(1)[0][0]
+
+
+def identify(text):
+    """Classify ``text`` as en, hi, ta, hinglish or tanglish.
+
+    Returns ``(label, confidence)`` with confidence in ``[0, 1]``.
+    """
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return "en", 0.0
+
+    native = {
+        "hi": sum(0x0900 <= ord(c) <= 0x097F for c in letters),
+        "ta": sum(0x0B80 <= ord(c) <= 0x0BFF for c in letters),
+    }
+    label, count = max(native.items(), key=lambda item: item[1])
+    if count / len(letters) >= 0.3:
+        return label, min(1.0, 0.5 + count / len(letters))
+
+    grams = _trigrams(text)
+    words = _WORD.findall(text.lower())
+    scores = {}
+    for label, (profile, unseen) in _PROFILES.items():
+        score = sum(profile.get(g, unseen) * n for g, n in grams.items())
+        hits = sum(w in _MARKERS.get(label, ()) for w in words)
+        scores[label] = score / max(1, sum(grams.values())) + 1.5 * hits / len(words)
+
+    # Softmax over per-trigram average log-likelihoods, sharpened so that a
+    # clear winner on a full sentence lands well above the fallback threshold.
+    top = max(scores.values())
+    weights = {label: math.exp(4 * (s - top)) for label, s in scores.items()}
+    best = max(weights, key=weights.get)
+    confidence = weights[best] / sum(weights.values())
+    # Very short utterances ("ok", "haan") carry too little signal to trust.
+    if len(words) < 3:
+        confidence *= len(words) / 3
+    return best, confidence
+
+
+# A Latin-script switch between English, Hinglish and Tanglish needs this
+# many words, or the speech-to-text hint agreeing, before the conversation's
+# language changes: a short "haan ji, bilkul" scores close to Tanglish.
+SWITCH_MIN_WORDS = 6
+
+
+class LanguageState:
+    """Per-conversation language tracker.
+
+    The local classifier runs on every utterance. Once the conversation has
+    a language it is sticky while the script is unchanged: low-confidence
+    input keeps it, and a confident switch must be long or confirmed by the
+    speech-to-text hint. A new script falls back to the hint and finally to
+    ``fallback`` (the LLM detector), so the expensive path only runs when a
+    conversation starts or genuinely switches. ``source`` records which of
+    these decided the last utterance and ``fallbacks`` counts LLM calls.
+    """
+
+    def __init__(self, threshold=0.6, switch_min_words=SWITCH_MIN_WORDS):
+        self.threshold = threshold
+        self.switch_min_words = switch_min_words
+        self.language = None
+        self.script = None
+        self.source = None
+        self.fallbacks = 0
+
+    def _confirms_switch(self, text, language, hint):
+        if hint in SUPPORTED:
+            return hint == language
+        return len(_WORD.findall(text)) >= self.switch_min_words
+
+    def detect(self, text, hint=None, fallback=None):
+        script = script_of(text)
+        label, confidence = identify(text)
+        hint = (hint or "").split("-")[0].lower()
+        local = CODES[label]
+        sticky = self.language is not None and script == self.script
+
+        if confidence >= self.threshold and (
+            not sticky or local == self.language or self._confirms_switch(text, local, hint)
+        ):
+            language, self.source = local, "local"
+        elif sticky:
+            language, self.source = self.language, "sticky"
+        elif hint in SUPPORTED:
+            language, self.source = hint, "hint"
+        elif fallback is not None:
+            language, self.source = fallback(text), "llm"
+            self.fallbacks += 1
+        else:
+            language, self.source = local, "local"
+
+        self.language, self.script = language, script
+        return language
@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from langid import LanguageState
+from prompting import ConversationMemory
+
+logger = logging.getLogger("sessions")
+
+# The worker runs each job (one room) in its own process, so this caps the
+# replies generated at once within one room, not across the worker.
+MAX_INFLIGHT_TURNS = int(os.getenv("MAX_INFLIGHT_TURNS", "8"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "900"))
+
+
+class Session:
+    """Conversation state for one participant in one room."""
+
+    def __init__(self, room, participant):
+        self.room = room
+        self.participant = participant
+        self.history = []
+        self.language_state = LanguageState()
+        self.memory = ConversationMemory()
+        self.slots = {}
+        self.summary_task = None
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+
+    @property
+    def key(self):
+        return (self.room, self.participant)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+
+class SessionManager:
+    """Owns every live session in a job process.
+
+    Sessions are keyed by ``(room, participant)`` so concurrent calls never
+    share history. Turns for one session run one at a time under its lock,
+    and at most ``max_inflight`` replies are being generated (retrieval and
+    the LLM call) in the process; playback does not hold a slot. The worker
+    runs one job per process, so that is a per-room limit; how many rooms a
+    worker host takes is LiveKit's job load balancing, not this. Blocking
+    work goes to a bounded thread pool of the same size rather than the
+    default ``asyncio.to_thread`` executor.
+    """
+
+    def __init__(self, max_inflight=MAX_INFLIGHT_TURNS, idle_timeout=SESSION_IDLE_SECONDS):
+        self.max_inflight = max_inflight
+        self.idle_timeout = idle_timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_inflight, thread_name_prefix="turn"
+        )
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._sessions = {}
+        self._evictor = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, room, participant):
+        session = self._sessions.get((room, participant))
+        if session is None:
+            session = Session(room, participant)
+            self._sessions[session.key] = session
+            logger.debug(f"[sessions] Opened {session.key}")
+        session.touch()
+        return session
+
+    def close(self, room, participant):
+        return self._sessions.pop((room, participant), None)
+
+    def close_room(self, room):
+        for key in [key for key in self._sessions if key[0] == room]:
+            del self._sessions[key]
+
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        evicted = [
+            key
+            for key, session in self._sessions.items()
+            if now - session.last_active > self.idle_timeout and not session.lock.locked()
+        ]
+        for key in evicted:
+            del self._sessions[key]
+        if evicted:
+            logger.debug(f"[sessions] Evicted {len(evicted)} idle sessions")
+        return evicted
+
+    def start_evictor(self, interval=60):
+        if self._evictor is None or self._evictor.done():
+            self._evictor = asyncio.create_task(self._evict_forever(interval))
+
+    async def _evict_forever(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    @asynccontextmanager
+    async def turn(self, session):
+        """Hold ``session``'s lock for a whole turn."""
+        async with session.lock:
+            session.touch()
+            try:
+                yield session
+            finally:
+                session.touch()
+
+    @asynccontextmanager
+    async def generating(self):
+        """Hold one in-flight slot while a reply is retrieved and generated."""
+        async with self._inflight:
+            yield
+
+    async def run(self, fn, *args, **kwargs):
+        """Run blocking ``fn`` on the bounded turn executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
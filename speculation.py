@@ -0,0 +1,150 @@
+import asyncio
+import difflib
+import os
+import time
+
+from cache import normalize_query
+
+# Retrieval is started before the turn is, on an interim transcript that has
+# not changed for SPECULATE_STABLE_SECONDS. The result is used for the turn
+# only if its text is close enough to what was speculated on and implies the
+# same slots. Finals are answered as soon as they arrive, so there is nothing
+# to gain by speculating on them. Off by default: it only pays off when the
+# final lags a pause in speech (benchmarks.speculation: about 300 ms with a
+# 300 ms embedding call), and a caller who hesitates mid-sentence costs a
+# paid retrieval that is thrown away.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "0") == "1"
+SPECULATE_STABLE_SECONDS = float(os.getenv("SPECULATE_STABLE_SECONDS", "0.5"))
+SPECULATE_MIN_WORDS = int(os.getenv("SPECULATE_MIN_WORDS", "3"))
+SPECULATE_SIMILARITY = float(os.getenv("SPECULATE_SIMILARITY", "0.85"))
+
+
+def similarity(a, b):
+    """Word-level similarity of two normalised transcripts, 0 to 1."""
+    return difflib.SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.turns = 0
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "turns": self.turns,
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "wasted": self.wasted,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    def __str__(self):
+        return (
+            f"speculation: {self.hits}/{self.turns} turns hit, "
+            f"{self.misses} misses, {self.wasted}/{self.started} calls wasted, "
+            f"{self.saved_seconds:.2f}s saved"
+        )
+
+
+class Speculator:
+    """Speculative retrieval for one participant.
+
+    ``start(text)`` begins retrieval for ``text`` and returns an awaitable
+    (e.g. a ``run_in_executor`` future). ``key(text)`` returns whatever else
+    must match for a result to be reused, such as the slots the text implies.
+    ``take(text)`` hands the turn a matching result, or ``None``.
+
+    ``on_interim`` takes the turn's whole text so far, with the finals
+    ``TurnController`` has joined into it (``TurnController.joined``).
+    ``on_final`` only stops a pending pause timer: the final's turn starts at
+    once and retrieves for itself if nothing matching was speculated.
+    """
+
+    def __init__(
+        self,
+        start,
+        key=None,
+        stable_seconds=SPECULATE_STABLE_SECONDS,
+        min_words=SPECULATE_MIN_WORDS,
+        threshold=SPECULATE_SIMILARITY,
+        stats=None,
+    ):
+        self.start = start
+        self.key = key or (lambda text: None)
+        self.stable_seconds = stable_seconds
+        self.min_words = min_words
+        self.threshold = threshold
+        self.stats = stats or SpeculationStats()
+        self._timer = None
+        self._pending = None
+
+    def on_interim(self, text):
+        self._cancel_timer()
+        if len(text.split()) >= self.min_words:
+            self._timer = asyncio.create_task(self._after_pause(text))
+
+    def on_final(self):
+        self._cancel_timer()
+
+    async def _after_pause(self, text):
+        await asyncio.sleep(self.stable_seconds)
+        self._timer = None
+        self._launch(text)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _launch(self, text):
+        normalized = normalize_query(text)
+        if not normalized:
+            return
+        if self._pending is not None:
+            if self._pending["text"] == normalized:
+                return
+            self._drop()
+        entry = {
+            "text": normalized,
+            "key": self.key(text),
+            "started": time.perf_counter(),
+            "done": None,
+        }
+        entry["future"] = future = asyncio.ensure_future(self.start(text))
+        future.add_done_callback(lambda _: entry.__setitem__("done", time.perf_counter()))
+        self._pending = entry
+        self.stats.started += 1
+
+    def _drop(self):
+        entry, self._pending = self._pending, None
+        entry["future"].cancel()
+        self.stats.wasted += 1
+
+    def take(self, text):
+        """The speculative result for the turn ``text`` as an awaitable, or ``None``."""
+        self._cancel_timer()
+        self.stats.turns += 1
+        entry = self._pending
+        if entry is None:
+            return None
+        if (
+            similarity(normalize_query(text), entry["text"]) < self.threshold
+            or self.key(text) != entry["key"]
+        ):
+            self._drop()
+            self.stats.misses += 1
+            return None
+        self._pending = None
+        self.stats.hits += 1
+        self.stats.saved_seconds += (entry["done"] or time.perf_counter()) - entry["started"]
+        return entry["future"]
+
+    def close(self):
+        self._cancel_timer()
+        if self._pending is not None:
+            self._drop()
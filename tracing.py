@@ -0,0 +1,328 @@
+"""Per-stage timing of conversation turns.
+
+A turn is traced with ``turn_trace(...)``; inside it, ``span(stage)`` times a
+stage and ``record(stage, start, end)`` adds one measured elsewhere (times
+from ``time.perf_counter()``). Outside a traced turn, or with tracing off,
+``span`` returns a shared no-op object, so instrumented code costs one
+context variable lookup. Work done before its turn exists (speculative
+retrieval) is run under ``capture`` and its spans ``adopt``-ed by the turn.
+
+Tracing is on when ``TRACE_ENABLED=1`` or ``TRACE_PATH`` is set. Finished
+turns go to the in-process ``HISTOGRAMS``, to ``TRACE_PATH`` as one JSON line
+per turn, and to OpenTelemetry when ``TRACE_OTEL=1`` and the SDK is installed.
+
+    python tracing.py traces.jsonl                 # slowest stages and trend
+    python tracing.py traces.jsonl --buckets 12 --slowest 10
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_PATH = os.getenv("TRACE_PATH")
+TRACE_OTEL = os.getenv("TRACE_OTEL", "0") == "1"
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0") == "1" or bool(TRACE_PATH) or TRACE_OTEL
+HISTOGRAM_SAMPLES = int(os.getenv("TRACE_HISTOGRAM_SAMPLES", "2048"))
+
+# Stage names, in the order they happen in a voice turn.
+STAGES = [
+    "stt_final",
+    "debounce",
+    "detect_language",
+    "embedding",
+    "similarity_search",
+    "build_prompt",
+    "llm",
+    "parse",
+    "tts_first_byte",
+]
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "stage", "start", "end", "attrs")
+
+    def __init__(self, trace, stage, attrs):
+        self.trace = trace
+        self.stage = stage
+        self.attrs = attrs
+        self.start = self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.spans.append(self)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name, attrs, start=None):
+        now = time.perf_counter()
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.start = now if start is None else start
+        self.wall_start = time.time() - (now - self.start)
+        self.end = None
+
+    def _wall(self, perf):
+        return self.wall_start + (perf - self.start)
+
+    def as_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "ts": round(self.wall_start, 3),
+            "duration_ms": round(1000 * (self.end - self.start), 2),
+            "attrs": self.attrs,
+            "spans": [
+                {
+                    "stage": s.stage,
+                    "offset_ms": round(1000 * (s.start - self.start), 2),
+                    "duration_ms": round(1000 * (s.end - s.start), 2),
+                    **s.attrs,
+                }
+                for s in sorted(self.spans, key=lambda s: s.start)
+            ],
+        }
+
+
+class LatencyHistogram:
+    """Recent durations of one stage, in milliseconds, with percentiles."""
+
+    def __init__(self, stage, maxlen=HISTOGRAM_SAMPLES):
+        self.stage = stage
+        self.count = 0
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, ms):
+        with self._lock:
+            self.count += 1
+            self._samples.append(ms)
+
+    def percentiles(self, *qs):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return [0.0 for _ in qs]
+        return [_percentile(ordered, q) for q in qs]
+
+    def as_dict(self):
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        return {"stage": self.stage, "count": self.count, "p50": p50, "p95": p95, "p99": p99}
+
+    def __str__(self):
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        return f"{self.stage}: p50 {p50:.0f}ms  p95 {p95:.0f}ms  p99 {p99:.0f}ms  (n={self.count})"
+
+
+HISTOGRAMS = {}
+_histograms_lock = threading.Lock()
+_file_lock = threading.Lock()
+_otel_tracer = None
+
+
+def histogram(stage):
+    hist = HISTOGRAMS.get(stage)
+    if hist is None:
+        with _histograms_lock:
+            hist = HISTOGRAMS.setdefault(stage, LatencyHistogram(stage))
+    return hist
+
+
+def histogram_stats():
+    """Histograms for every stage seen so far, in pipeline order."""
+    order = {stage: i for i, stage in enumerate(STAGES)}
+    return [HISTOGRAMS[s] for s in sorted(HISTOGRAMS, key=lambda s: order.get(s, len(order)))]
+
+
+def span(stage, **attrs):
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return Span(trace, stage, attrs)
+
+
+def record(stage, start, end, **attrs):
+    """Add a stage timed outside a ``span`` block to the current turn."""
+    trace = _current.get()
+    if trace is None:
+        return
+    measured = Span(trace, stage, attrs)
+    measured.start, measured.end = start, end
+    trace.spans.append(measured)
+
+
+def capture(fn, *args, **kwargs):
+    """Call ``fn`` outside any turn, keeping the spans it records for ``adopt``.
+
+    Returns ``(result, spans)``; ``spans`` is empty with tracing off.
+    """
+    if not TRACE_ENABLED:
+        return fn(*args, **kwargs), []
+    trace = Trace("capture", {})
+    token = _current.set(trace)
+    try:
+        return fn(*args, **kwargs), trace.spans
+    finally:
+        _current.reset(token)
+
+
+def adopt(spans, **attrs):
+    """Add spans from ``capture`` to the current turn, e.g. work done ahead of it."""
+    trace = _current.get()
+    if trace is None:
+        return
+    for s in spans:
+        s.trace = trace
+        s.attrs.update(attrs)
+        trace.spans.append(s)
+
+
+@contextmanager
+def turn_trace(name, start=None, enabled=None, **attrs):
+    """Trace everything inside the block as one turn; yields the trace or ``None``.
+
+    ``start`` backdates the turn, e.g. to when the caller stopped speaking.
+    """
+    if not (TRACE_ENABLED if enabled is None else enabled):
+        yield None
+        return
+    trace = Trace(name, attrs, start)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.end = time.perf_counter()
+        _export(trace)
+
+
+def _export(trace):
+    for s in trace.spans:
+        histogram(s.stage).add(1000 * (s.end - s.start))
+    histogram("turn").add(1000 * (trace.end - trace.start))
+    if TRACE_PATH:
+        line = json.dumps(trace.as_dict(), ensure_ascii=False)
+        with _file_lock, open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    if TRACE_OTEL:
+        _export_otel(trace)
+
+
+def _export_otel(trace):
+    global _otel_tracer
+    try:
+        from opentelemetry import trace as otel
+    except ImportError:
+        return
+    if _otel_tracer is None:
+        _otel_tracer = otel.get_tracer("unbroker")
+
+    def ns(perf):
+        return int(trace._wall(perf) * 1e9)
+
+    root = _otel_tracer.start_span(trace.name, start_time=ns(trace.start), attributes=trace.attrs)
+    parent = otel.set_span_in_context(root)
+    for s in trace.spans:
+        child = _otel_tracer.start_span(
+            s.stage, context=parent, start_time=ns(s.start), attributes=s.attrs
+        )
+        child.end(end_time=ns(s.end))
+    root.end(end_time=ns(trace.end))
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def report(path, buckets=6, slowest=5):
+    with open(path, encoding="utf-8") as f:
+        traces = [json.loads(line) for line in f if line.strip()]
+    if not traces:
+        print(f"No traces in {path}")
+        return
+    traces.sort(key=lambda t: t["ts"])
+
+    durations = {}
+    for t in traces:
+        durations.setdefault("turn", []).append(t["duration_ms"])
+        for s in t["spans"]:
+            durations.setdefault(s["stage"], []).append(s["duration_ms"])
+
+    print(f"{len(traces)} turns from {time.ctime(traces[0]['ts'])} to {time.ctime(traces[-1]['ts'])}\n")
+    print(f"{'stage':<18} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  ms")
+    for stage, values in sorted(durations.items(), key=lambda kv: -_percentile(sorted(kv[1]), 95)):
+        ordered = sorted(values)
+        p50, p95, p99 = (_percentile(ordered, q) for q in (50, 95, 99))
+        print(f"{stage:<18} {len(values):>6} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {ordered[-1]:>8.1f}")
+
+    # Trend: p50 per stage over equal slices of the trace file.
+    size = max(1, -(-len(traces) // buckets))
+    slices = [traces[i : i + size] for i in range(0, len(traces), size)]
+    stages = [s for s in STAGES if s in durations] + ["turn"]
+    print(f"\np50 ms by period ({size} turns each)")
+    print(f"{'period start':<20}" + "".join(f"{s[:12]:>13}" for s in stages))
+    for chunk in slices:
+        row = f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(chunk[0]['ts'])):<20}"
+        for stage in stages:
+            if stage == "turn":
+                values = [t["duration_ms"] for t in chunk]
+            else:
+                values = [s["duration_ms"] for t in chunk for s in t["spans"] if s["stage"] == stage]
+            row += f"{_percentile(sorted(values), 50):>13.1f}" if values else f"{'-':>13}"
+        print(row)
+
+    print(f"\nSlowest {slowest} turns")
+    for t in sorted(traces, key=lambda t: -t["duration_ms"])[:slowest]:
+        worst = max(t["spans"], key=lambda s: s["duration_ms"], default=None)
+        blame = f"{worst['stage']} {worst['duration_ms']:.0f}ms" if worst else "no spans"
+        print(f"{t['duration_ms']:>9.1f}ms  {t['trace_id'][:8]}  slowest stage: {blame}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise turn traces written to TRACE_PATH.")
+    parser.add_argument("path", nargs="?", default=TRACE_PATH)
+    parser.add_argument("--buckets", type=int, default=6)
+    parser.add_argument("--slowest", type=int, default=5)
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("pass a trace file or set TRACE_PATH")
+    report(args.path, args.buckets, args.slowest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+
+from cache import _FILLERS, normalize_query
+
+logger = logging.getLogger("turns")
+
+# A final this soon after the previous one (or after speech that followed
+# it) is joined to that turn, and the reply already started is restarted.
+DEBOUNCE_SECONDS = float(os.getenv("TURN_DEBOUNCE_SECONDS", "0.6"))
+# Speech-to-text runs with filler words on, so an interim of "hmm" or
+# "haan" arrives while the agent talks. Outside the join window an interim
+# needs this many other words to barge in, and a final made only of fillers
+# and acknowledgements does not interrupt the reply.
+BARGE_IN_MIN_WORDS = int(os.getenv("BARGE_IN_MIN_WORDS", "2"))
+BACKCHANNELS = _FILLERS | {
+    "hm", "mm", "mhm", "haan", "han", "ha", "ji", "acha", "achha", "accha",
+    "ok", "okay", "yeah", "yes", "right", "aama", "seri", "sari",
+}
+# Used to estimate how much speech a cancelled reply would have produced
+# until real completed turns have been measured.
+DEFAULT_REPLY_SECONDS = 12.0
+
+
+def content_words(text):
+    """Words of ``text`` that are not fillers or backchannel acknowledgements."""
+    return [word for word in normalize_query(text).split() if word not in BACKCHANNELS]
+
+
+class Turn:
+    """Bookkeeping for one reply: what was generated and what was synthesised."""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = 0
+        self.audio_seconds = 0.0
+        self.cancelled = False
+        # Cancelled to be restarted with more of the caller's speech.
+        self.superseded = False
+
+    def count_token(self, _token=None):
+        self.tokens += 1
+
+    def count_audio(self, seconds):
+        self.audio_seconds += seconds
+
+
+class TurnMetrics:
+    def __init__(self):
+        self.turns = 0
+        self.completed = 0
+        self.interruptions = 0
+        self.debounced_finals = 0
+        self.restarts = 0
+        self.backchannels = 0
+        self.cancelled_tokens = 0
+        self.tts_seconds_saved = 0.0
+        self.flushed_audio_seconds = 0.0
+        self._reply_seconds = 0.0
+
+    @property
+    def mean_reply_seconds(self):
+        if not self.completed:
+            return DEFAULT_REPLY_SECONDS
+        return self._reply_seconds / self.completed
+
+    def record(self, turn):
+        if turn.superseded:
+            self.restarts += 1
+            return
+        self.turns += 1
+        if turn.cancelled:
+            self.interruptions += 1
+            self.cancelled_tokens += turn.tokens
+            self.tts_seconds_saved += max(0.0, self.mean_reply_seconds - turn.audio_seconds)
+        else:
+            self.completed += 1
+            self._reply_seconds += turn.audio_seconds
+
+    def as_dict(self):
+        return {
+            "turns": self.turns,
+            "completed": self.completed,
+            "interruptions": self.interruptions,
+            "debounced_finals": self.debounced_finals,
+            "restarts": self.restarts,
+            "backchannels": self.backchannels,
+            "cancelled_tokens": self.cancelled_tokens,
+            "tts_seconds_saved": round(self.tts_seconds_saved, 2),
+            "flushed_audio_seconds": round(self.flushed_audio_seconds, 2),
+        }
+
+
+class TurnController:
+    """Turn taking for one participant.
+
+    A final transcript is answered straight away. If the caller goes on
+    speaking within ``debounce`` seconds (a split final), the reply is
+    cancelled and restarted with the joined text; if that speech never
+    gets a final, the joined finals are answered after ``debounce`` seconds
+    of quiet. Later speech is a barge-in: it cancels the reply in flight, and
+    ``flush_audio`` is called to drop audio that is queued but not yet played.
+    Fillers and acknowledgements ("hmm", "haan ji") said over the reply are
+    not a barge-in (see ``BARGE_IN_MIN_WORDS``).
+
+    ``respond(text, language_hint, turn)`` is the coroutine that produces and
+    speaks a reply; it should report progress through ``turn``. A turn
+    cancelled to be restarted has ``turn.superseded`` set.
+    ``flush_audio()`` returns the seconds of audio it dropped.
+    """
+
+    def __init__(self, respond, flush_audio=None, debounce=DEBOUNCE_SECONDS, metrics=None):
+        self.respond = respond
+        self.flush_audio = flush_audio
+        self.debounce = debounce
+        self.metrics = metrics or TurnMetrics()
+        # Finals of the latest turn, which speech within the window joins.
+        self._pending = []
+        self._language_hint = None
+        self._joinable_until = 0.0
+        self._timer = None
+        self._starting = None
+        self._task = None
+        self._turn = None
+
+    @property
+    def responding(self):
+        return self._task is not None and not self._task.done()
+
+    @property
+    def joinable(self):
+        """Whether speech now still belongs to the latest turn."""
+        return bool(self._pending) and asyncio.get_running_loop().time() < self._joinable_until
+
+    def joined(self, text=""):
+        """The latest turn's text with ``text`` appended, as it would be answered."""
+        return " ".join(self._pending + [text]).strip()
+
+    def on_interim(self, text):
+        """The caller is speaking: stop talking over them and wait for the final."""
+        if not text.strip():
+            return
+        if self.joinable:
+            # Still the same turn: hold the reply until the final, or until
+            # the caller has been quiet for the window if none comes.
+            self._supersede()
+            self._extend_window()
+            self._timer = asyncio.create_task(self._answer_after_quiet())
+        elif len(content_words(text)) >= BARGE_IN_MIN_WORDS:
+            self._pending = []
+            self.interrupt()
+
+    def on_final(self, text, language_hint=None):
+        text = text.strip()
+        if not text:
+            return
+        if not self.joinable and self.responding and not content_words(text):
+            logger.debug(f"[turns] Backchannel during reply: {text}")
+            self.metrics.backchannels += 1
+            return
+        if self.joinable:
+            self._supersede()
+            self.metrics.debounced_finals += 1
+            self._pending.append(text)
+            self._language_hint = language_hint or self._language_hint
+        else:
+            self.interrupt()
+            self._pending = [text]
+            self._language_hint = language_hint
+        self._extend_window()
+        self._start()
+
+    def interrupt(self):
+        self._cancel_pending()
+        if not self.responding:
+            return False
+        logger.info(f"✋ Barge-in, cancelling reply to: {self._turn.text}")
+        self._cancel_reply()
+        return True
+
+    def _supersede(self):
+        self._cancel_pending()
+        if self.responding:
+            logger.debug(f"[turns] Restarting reply to: {self._turn.text}")
+            self._turn.superseded = True
+            self._cancel_reply()
+
+    def _cancel_reply(self):
+        self._turn.cancelled = True
+        self._task.cancel()
+        if self.flush_audio is not None:
+            self.metrics.flushed_audio_seconds += self.flush_audio() or 0.0
+
+    def _cancel_pending(self):
+        for task in (self._timer, self._starting):
+            if task is not None:
+                task.cancel()
+        self._timer = self._starting = None
+
+    def _extend_window(self):
+        self._joinable_until = asyncio.get_running_loop().time() + self.debounce
+
+    async def _answer_after_quiet(self):
+        await asyncio.sleep(self.debounce)
+        self._timer = None
+        self._start()
+
+    def _start(self):
+        self._starting = asyncio.create_task(
+            self._start_reply(self.joined(), self._language_hint)
+        )
+
+    async def _start_reply(self, text, language_hint):
+        if self._task is not None:
+            # Let the cancelled reply finish unwinding before starting anew.
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._starting = None
+        self._turn = turn = Turn(text)
+        self._task = asyncio.create_task(self._run(turn, language_hint))
+
+    async def _run(self, turn, language_hint):
+        try:
+            await self.respond(turn.text, language_hint, turn)
+        except asyncio.CancelledError:
+            turn.cancelled = True
+            raise
+        finally:
+            self.metrics.record(turn)
+
+    async def wait_idle(self):
+        """Wait until no turn is pending or in flight."""
+        while self._timer is not None or self._starting is not None or self.responding:
+            await asyncio.gather(
+                *(t for t in (self._timer, self._starting, self._task) if t is not None),
+                return_exceptions=True,
+            )
+
+    async def aclose(self):
+        self._cancel_pending()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
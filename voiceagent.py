@@ -2,58 +2,205 @@ import asyncio
 import logging
 import os
 import sys
+import time
 from dotenv import load_dotenv
 from livekit import rtc
 from livekit.agents import (
     AutoSubscribe,
     JobContext,
+    JobExecutorType,
+    JobProcess,
     WorkerOptions,
     cli,
     stt,
 )
 from livekit.plugins.elevenlabs import VoiceSettings
 
-chat_history = []
-
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+# Load env before the project modules below, which read their settings
+# (MAX_INFLIGHT_TURNS, TRACE_PATH, ...) at import time.
+load_dotenv()
+
 from livekit.plugins import deepgram, elevenlabs
-from bot import generate_response
+from bot import (
+    cache_stats,
+    load_resources,
+    speculate,
+    stream_response,
+    turn_slots,
+    update_memory,
+    warm_connections,
+)
+from sessions import SessionManager
+from speculation import SPECULATIVE_RETRIEVAL, Speculator
+from tracing import adopt, capture, histogram_stats, record, turn_trace
+from turns import DEBOUNCE_SECONDS, Turn, TurnController
+
+sessions = SessionManager()
 
-# Load env
-load_dotenv()
 deepgram_api_key = os.getenv("DEEPGRAM_API_KEY")
 eleven_api_key = os.getenv("ELEVENLABS_API_KEY")
 
 logger = logging.getLogger("transcribe")
 logging.basicConfig(level=logging.DEBUG)
 
-# === Warm-up OpenAI ===
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
+# Reply languages whose TTS client is connected before the first turn.
+PREWARM_LANGUAGES = ("hi", "en")
 
-warm_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
-warm_llm.invoke([HumanMessage(content="Hi!")])
 
+def make_tts(language):
+    return elevenlabs.TTS(
+        voice_id="VJzrUxHaC52mTyYHMCnK",
+        model="eleven_turbo_v2_5",
+        encoding="mp3_44100_128",
+        api_key=eleven_api_key,
+        language=language,
+        voice_settings=VoiceSettings(speed=0.8),
+    )
 
-def fetch_response(user_input):
-    logger.debug(f"[fetch_response] User input: {user_input}")
-    chat_history.append({"role": "user", "content": user_input})
-    result = generate_response(chat_history, voice_mode=True)
-    chat_history.append({"role": "assistant", "content": result["text"]})
-    logger.debug(f"[fetch_response] Response from bot: {result}")
-    return result["text"], result.get("language", "hi"), result.get("image_urls", [])
 
+class TTSPool:
+    """One ElevenLabs client per reply language, shared by every turn in a job.
 
-async def entrypoint(ctx: JobContext):
-    logger.info(f"🚀 Starting transcriber for room: {ctx.room.name}")
+    Each job (room) has its own pool: closing a client closes every stream on
+    it, and its HTTP session belongs to the job that created it.
+    """
+
+    def __init__(self):
+        self._clients = {}
+
+    def get(self, language):
+        client = self._clients.get(language)
+        if client is None:
+            client = self._clients[language] = make_tts(language)
+            prewarm = getattr(client, "prewarm", None)
+            if prewarm is not None:
+                prewarm()
+        return client
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+def prewarm(proc: JobProcess):
+    """Runs once per worker process, before it is handed a job."""
+    load_resources()
+
+
+async def speak_response(
+    audio_src, tts_pool, session, user_query, language_hint=None, turn=None, speculation=None
+):
+    async with sessions.turn(session):
+        await _speak_turn(
+            audio_src,
+            tts_pool,
+            session,
+            user_query,
+            language_hint,
+            turn or Turn(user_query),
+            speculation,
+        )
+
+
+async def _speak_turn(audio_src, tts_pool, session, user_query, language_hint, turn, speculation):
+    logger.debug(f"[speak_response] {session.key} User input: {user_query}")
+    question = {"role": "user", "content": user_query}
+    session.history.append(question)
+    result = {"text": "", "image_urls": [], "language": "hi"}
+    spoken = []
+    tts_stream = None
+    playout = None
+    first_text_at = None
+
+    async def _play(synth_stream):
+        async for chunk in synth_stream:
+            if not turn.audio_seconds:
+                record("tts_first_byte", first_text_at, time.perf_counter())
+            turn.count_audio(chunk.frame.duration)
+            await audio_src.capture_frame(chunk.frame)
+
+    events = stream_response(
+        session.history,
+        voice_mode=True,
+        language_state=session.language_state,
+        language_hint=language_hint,
+        memory=session.memory,
+        slots=session.slots,
+        executor=sessions.executor,
+        on_token=turn.count_token,
+        speculation=speculation,
+    )
+    # Sentences are pushed to the TTS websocket as soon as the LLM finishes
+    # them, so playback starts while the rest of the reply is still generating.
+    # The in-flight slot covers retrieval and generation; the tail of the
+    # reply plays out after it is released.
+    try:
+        async with sessions.generating():
+            async for event in events:
+                if event["type"] == "start":
+                    tts_stream = tts_pool.get(event["language"]).stream()
+                    playout = asyncio.create_task(_play(tts_stream))
+                elif event["type"] == "sentence":
+                    logger.debug(f"[speak_response] Sentence: {event['text']}")
+                    spoken.append(event["text"])
+                    first_text_at = first_text_at or time.perf_counter()
+                    tts_stream.push_text(event["text"] + " ")
+                    tts_stream.flush()
+                else:
+                    result = event
+    except asyncio.CancelledError:
+        turn.cancelled = True
+        if turn.superseded:
+            # Restarted with more of the caller's speech, which is asked anew.
+            session.history.remove(question)
+        elif spoken:
+            # Barge-in: keep what was already said so the next turn has context.
+            session.history.append({"role": "assistant", "content": " ".join(spoken)})
+        raise
+    finally:
+        # Closing the generator closes the LLM stream instead of letting it
+        # run to completion in the background.
+        await events.aclose()
+        if tts_stream is not None:
+            if turn.cancelled:
+                playout.cancel()
+            else:
+                tts_stream.end_input()
+            await asyncio.gather(playout, return_exceptions=True)
+            await tts_stream.aclose()
+
+    session.history.append({"role": "assistant", "content": result["text"]})
+    summarise_later(session)
+    logger.debug(f"[speak_response] Response from bot: {result}")
+    logger.info(f"💬 Bot response [{result['language']}]: {result['text']}")
+    for url in result["image_urls"]:
+        logger.info(f"image url: {url}")
+
+
+def summarise_later(session):
+    """Fold turns that left the history window into the session's summary.
+
+    Runs after the audio is out, off the time-to-first-audio path, and as its
+    own task: the reply is complete, so speech from the caller now must not
+    cancel it. If a summary is still running, the next turn folds these in.
+    """
+    if session.summary_task is not None and not session.summary_task.done():
+        return
+    session.summary_task = asyncio.create_task(_summarise(session, list(session.history)))
+
+
+async def _summarise(session, history):
+    try:
+        await sessions.run(update_memory, session.memory, history)
+    except Exception as e:
+        logger.warning(f"[memory] Summary failed for {session.key}: {e!r}")
 
-    # === Audio Setup ===
-    audio_src = rtc.AudioSource(sample_rate=44100, num_channels=1)
-    audio_track = rtc.LocalAudioTrack.create_audio_track("bot-tts", audio_src)
 
-    # === Deepgram STT ===
-    stt_impl = deepgram.STT(
+def make_stt():
+    return deepgram.STT(
         model="nova-3-general",
         api_key=deepgram_api_key,
         language="multi",
@@ -65,6 +212,138 @@ async def entrypoint(ctx: JobContext):
         numerals=True,
     )
 
+
+async def converse(
+    stt_stream,
+    audio_src,
+    room_name,
+    identity,
+    debounce=DEBOUNCE_SECONDS,
+    drain=False,
+    speculative=SPECULATIVE_RETRIEVAL,
+    speculation_stats=None,
+    tts_pool=None,
+):
+    """Answer one participant's transcripts from ``stt_stream`` until it ends.
+
+    A reply still in flight when the stream ends is cancelled, or with
+    ``drain`` (for replayed transcripts) allowed to finish. With
+    ``speculative``, retrieval starts on interims that stay unchanged for a
+    moment (see ``speculation.py``).
+    Replies are synthesised with the job's ``tts_pool``; without one, a pool
+    is opened for this participant and closed when the stream ends.
+    """
+    loop = asyncio.get_running_loop()
+    own_pool = tts_pool is None
+    if own_pool:
+        tts_pool = TTSPool()
+
+    def _flush_audio():
+        queued = audio_src.queued_duration
+        audio_src.clear_queue()
+        return queued
+
+    # perf_counter() of the latest interim, and the (last interim, final)
+    # pair of the final that ended the turn.
+    stt_times = {"interim": None, "final": None}
+
+    def _speculate(text):
+        session = sessions.get(room_name, identity)
+        return loop.run_in_executor(
+            sessions.executor, capture, speculate, text, dict(session.slots)
+        )
+
+    async def _with_spans(speculation):
+        result, spans = await speculation
+        adopt(spans, speculative=True)
+        return result
+
+    def _slots(text):
+        return turn_slots(text, sessions.get(room_name, identity).slots)
+
+    speculator = (
+        Speculator(_speculate, key=_slots, stats=speculation_stats) if speculative else None
+    )
+
+    async def _respond(user_query, language_hint, turn):
+        session = sessions.get(room_name, identity)
+        interim_at, final_at = stt_times["final"] or (None, None)
+        speculation = speculator.take(user_query) if speculator is not None else None
+        with turn_trace(
+            "turn",
+            start=interim_at,
+            room=room_name,
+            participant=identity,
+            speculative=speculation is not None,
+        ) as trace:
+            if final_at is not None:
+                record("stt_final", interim_at, final_at)
+                record("debounce", final_at, time.perf_counter())
+            if speculation is not None:
+                # The retrieval ran before this turn; its spans join the turn's trace.
+                speculation = asyncio.ensure_future(_with_spans(speculation))
+            try:
+                await speak_response(
+                    audio_src, tts_pool, session, user_query, language_hint, turn, speculation
+                )
+            finally:
+                if trace is not None:
+                    trace.attrs.update(
+                        tokens=turn.tokens, cancelled=turn.cancelled, superseded=turn.superseded
+                    )
+
+    turns = TurnController(_respond, flush_audio=_flush_audio, debounce=debounce)
+
+    try:
+        async for ev in stt_stream:
+            if ev.type == stt.SpeechEventType.INTERIM_TRANSCRIPT:
+                stt_times["interim"] = time.perf_counter()
+                turns.on_interim(ev.alternatives[0].text)
+                if speculator is not None:
+                    speculator.on_interim(turns.joined(ev.alternatives[0].text))
+            elif ev.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
+                user_query = ev.alternatives[0].text.strip()
+                # Deepgram reports the spoken language when running with
+                # language="multi"; it backs up the local identifier.
+                language_hint = ev.alternatives[0].language
+                if not user_query:
+                    logger.warning("⚠️ Empty user query, skipping.")
+                    continue
+
+                logger.info(f"📝 User query: {identity}: {user_query}")
+                now = time.perf_counter()
+                stt_times["final"] = (stt_times["interim"] or now, now)
+                stt_times["interim"] = None
+                turns.on_final(user_query, language_hint)
+                if speculator is not None:
+                    speculator.on_final()
+        if drain:
+            await turns.wait_idle()
+    finally:
+        await turns.aclose()
+        if own_pool:
+            await tts_pool.aclose()
+        logger.info(f"🔁 Turn metrics for {identity}: {turns.metrics.as_dict()}")
+        if speculator is not None:
+            speculator.close()
+            logger.info(f"🔮 {identity} {speculator.stats}")
+    return turns.metrics
+
+
+async def entrypoint(ctx: JobContext):
+    logger.info(f"🚀 Starting transcriber for room: {ctx.room.name}")
+    # Connection set-up overlaps with joining the room instead of the first turn.
+    warmup = asyncio.create_task(warm_connections())
+    tts_pool = TTSPool()
+    for language in PREWARM_LANGUAGES:
+        tts_pool.get(language)
+
+    # === Audio Setup ===
+    audio_src = rtc.AudioSource(sample_rate=44100, num_channels=1)
+    audio_track = rtc.LocalAudioTrack.create_audio_track("bot-tts", audio_src)
+
+    stt_impl = make_stt()
+
     async def transcribe_track(participant: rtc.RemoteParticipant, track: rtc.Track):
         logger.info(f"🎧 Starting transcription for: {participant.identity}")
         audio_stream = rtc.AudioStream(track)
@@ -74,43 +353,11 @@ async def entrypoint(ctx: JobContext):
             async for ev in audio_stream:
                 stt_stream.push_frame(ev.frame)
 
-        async def _handle_transcription_output():
-            async for ev in stt_stream:
-                if ev.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
-                    user_query = ev.alternatives[0].text.strip()
-                    if not user_query:
-                        logger.warning("⚠️ Empty user query, skipping.")
-                        continue
-
-                    logger.info(f"📝 User query: {participant.identity}: {user_query}")
-
-                    async def respond_and_speak():
-                        response_text, lang, image_urls = await asyncio.to_thread(
-                            fetch_response, user_query
-                        )
-                        logger.info(f"💬 Bot response [{lang}]: {response_text}")
-                        if image_urls:
-                            for url in image_urls:
-                                logger.info(f"image url: {url}")
-
-                        tts = elevenlabs.TTS(
-                            voice_id="VJzrUxHaC52mTyYHMCnK",
-                            model="eleven_turbo_v2_5",
-                            encoding="mp3_44100_128",
-                            api_key=eleven_api_key,
-                            language=lang,
-                            oice_settings=VoiceSettings(speed=0.8),
-                        )
-
-                        synth_stream = tts.synthesize(response_text)
-                        async for chunk in synth_stream:
-                            await audio_src.capture_frame(chunk.frame)
-
-                    asyncio.create_task(respond_and_speak())
-
         await asyncio.gather(
             _handle_audio_stream(),
-            _handle_transcription_output(),
+            converse(
+                stt_stream, audio_src, ctx.room.name, participant.identity, tts_pool=tts_pool
+            ),
         )
 
     @ctx.room.on("track_subscribed")
@@ -122,14 +369,38 @@ async def entrypoint(ctx: JobContext):
     def on_participant_joined(participant):
         logger.info(f"👤 Participant joined: {participant.identity}")
 
+    @ctx.room.on("participant_disconnected")
+    def on_participant_disconnected(participant):
+        sessions.close(ctx.room.name, participant.identity)
+
     @ctx.room.on("track_published")
     def on_track_published(publication, participant):
         logger.info(f"🛁 Track published from {participant.identity}")
 
+    async def _close_room():
+        sessions.close_room(ctx.room.name)
+        await tts_pool.aclose()
+        for stats in cache_stats():
+            logger.info(f"📦 Cache {stats}")
+        for hist in histogram_stats():
+            logger.info(f"⏱️ Latency {hist}")
+
+    ctx.add_shutdown_callback(_close_room)
+    sessions.start_evictor()
+
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
     await ctx.room.local_participant.publish_track(audio_track)
+    await warmup
     logger.info("✅ Ready and listening...")
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    # One job per process: ``sessions`` and its in-flight limit are per room,
+    # and the chat clients' connection pools stay on one event loop.
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
+            job_executor_type=JobExecutorType.PROCESS,
+        )
+    )